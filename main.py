@@ -5,13 +5,10 @@ import signal
 import sys
 from pathlib import Path
 
-from src.adapters.base import BaseAdapter
-from src.adapters.matrix import MatrixAdapter, MatrixAuthError
-from src.adapters.signal import SignalAdapter
-from src.adapters.telegram import TelegramAdapter
+from src.adapters.base import BaseAdapter, FileMessage
 from src.config import Config
 from src.file_processor import FileProcessor
-from src.uploader import DryRunUploader, NextcloudUploader
+from src.uploader import DryRunUploader, NextcloudAsyncUploader
 
 logging.basicConfig(
     level=logging.INFO,
@@ -43,9 +40,19 @@ def parse_args() -> argparse.Namespace:
     return parser.parse_args()
 
 
+WorkQueue = asyncio.Queue[tuple[BaseAdapter, FileMessage]]
+
+
+def _is_matrix_auth_error(error: Exception) -> bool:
+    # The matrix module is only imported when enabled; if it isn't loaded, no
+    # MatrixAuthError can have been raised
+    matrix = sys.modules.get("src.adapters.matrix")
+    return matrix is not None and isinstance(error, matrix.MatrixAuthError)
+
+
 async def run_adapter(
     adapter: BaseAdapter,
-    processor: FileProcessor,
+    work_queue: WorkQueue,
     stop_event: asyncio.Event,
 ) -> None:
     try:
@@ -53,18 +60,31 @@ async def run_adapter(
         logger.info(f"Started {adapter.platform_name} adapter")
 
         async for file_message in adapter.listen():
-            await processor.process_file(adapter, file_message)
+            await work_queue.put((adapter, file_message))
 
-    except MatrixAuthError as e:
-        logger.error(f"\n{'='*60}\nMatrix Authentication Error:\n{'='*60}\n{e}\n{'='*60}")
-        stop_event.set()
     except asyncio.CancelledError:
         logger.info(f"Stopping {adapter.platform_name} adapter")
     except Exception as e:
-        logger.error(f"Unexpected error in {adapter.platform_name} adapter: {e}")
+        if _is_matrix_auth_error(e):
+            logger.error(f"\n{'='*60}\nMatrix Authentication Error:\n{'='*60}\n{e}\n{'='*60}")
+        else:
+            logger.error(f"Unexpected error in {adapter.platform_name} adapter: {e}")
         stop_event.set()
     finally:
-        await adapter.disconnect()
+        # A failing disconnect must not take the TaskGroup, and the shutdown, down with it
+        try:
+            await adapter.disconnect()
+        except Exception as e:
+            logger.error(f"Error disconnecting {adapter.platform_name} adapter: {e}")
+
+
+async def worker(work_queue: WorkQueue, processor: FileProcessor) -> None:
+    while True:
+        adapter, file_message = await work_queue.get()
+        try:
+            await processor.process_file(adapter, file_message)
+        finally:
+            work_queue.task_done()
 
 
 async def main() -> None:
@@ -84,23 +104,32 @@ async def main() -> None:
         logger.info("Running in DRY-RUN mode - no files will be uploaded")
         uploader = DryRunUploader(config.nextcloud)
     else:
-        uploader = NextcloudUploader(config.nextcloud)
+        uploader = NextcloudAsyncUploader(config.nextcloud)
 
-    if not uploader.check_connection():
+    if not await uploader.check_connection():
         logger.warning("Could not verify Nextcloud connection. Will retry on upload.")
 
-    processor = FileProcessor(uploader, config.path_template)
+    processor = FileProcessor(
+        uploader, config.path_template, max_downloads=config.download_concurrency
+    )
 
     adapters: list[BaseAdapter] = []
 
+    # Adapter modules pull in heavy SDKs, so only import the enabled ones
     if config.adapters.matrix:
-        adapters.append(MatrixAdapter(config.adapters.matrix))
+        from src.adapters.matrix import MatrixAdapter
+
+        adapters.append(MatrixAdapter(config.adapters.matrix, queue_size=config.queue_size))
 
     if config.adapters.telegram:
-        adapters.append(TelegramAdapter(config.adapters.telegram))
+        from src.adapters.telegram import TelegramAdapter
+
+        adapters.append(TelegramAdapter(config.adapters.telegram, queue_size=config.queue_size))
 
     if config.adapters.signal:
-        adapters.append(SignalAdapter(config.adapters.signal))
+        from src.adapters.signal import SignalAdapter
+
+        adapters.append(SignalAdapter(config.adapters.signal, queue_size=config.queue_size))
 
     if not adapters:
         logger.error("No adapters enabled in configuration")
@@ -109,10 +138,7 @@ async def main() -> None:
     loop = asyncio.get_running_loop()
     stop_event = asyncio.Event()
 
-    tasks = [
-        asyncio.create_task(run_adapter(adapter, processor, stop_event))
-        for adapter in adapters
-    ]
+    work_queue: WorkQueue = asyncio.Queue(maxsize=64)
 
     def signal_handler() -> None:
         logger.info("Shutdown signal received")
@@ -121,12 +147,26 @@ async def main() -> None:
     for sig in (signal.SIGINT, signal.SIGTERM):
         loop.add_signal_handler(sig, signal_handler)
 
-    await stop_event.wait()
+    # Leaving the group waits for every adapter and worker to finish unwinding
+    async with asyncio.TaskGroup() as tg:
+        tasks = [
+            tg.create_task(run_adapter(adapter, work_queue, stop_event))
+            for adapter in adapters
+        ]
+        # Twice as many workers as download slots, so finished downloads can
+        # upload while the next ones are fetched
+        tasks += [
+            tg.create_task(worker(work_queue, processor))
+            for _ in range(2 * config.download_concurrency)
+        ]
+
+        await stop_event.wait()
+
+        for task in tasks:
+            task.cancel()
 
-    for task in tasks:
-        task.cancel()
+    await uploader.close()
 
-    await asyncio.gather(*tasks, return_exceptions=True)
     logger.info("Shutdown complete")
 
 
@@ -0,0 +1,24 @@
+import ssl
+
+import aiohttp
+
+# Built once so every session shares the CA bundle and TLS session tickets
+_SSL_CTX = ssl.create_default_context()
+
+
+def make_session(
+    limit: int = 16,
+    limit_per_host: int = 8,
+    headers: dict[str, str] | None = None,
+    timeout: aiohttp.ClientTimeout | None = None,
+) -> aiohttp.ClientSession:
+    """Create a keep-alive HTTP session backed by the shared SSL context."""
+    connector = aiohttp.TCPConnector(
+        ssl=_SSL_CTX,
+        limit=limit,
+        limit_per_host=limit_per_host,
+        keepalive_timeout=75,
+    )
+    if timeout is None:
+        return aiohttp.ClientSession(connector=connector, headers=headers)
+    return aiohttp.ClientSession(connector=connector, headers=headers, timeout=timeout)
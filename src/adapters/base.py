@@ -1,11 +1,13 @@
+import asyncio
 from abc import ABC, abstractmethod
+from collections import deque
 from collections.abc import AsyncIterator
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timezone
 from pathlib import Path
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class FileMessage:
     platform: str
     room_id: str
@@ -15,13 +17,85 @@ class FileMessage:
     filename: str
     mimetype: str
     size: int
-    timestamp: datetime
+    timestamp_ms: int  # Unix epoch milliseconds, converted only when needed
     download_url: str
     message_id: str
+    payload: bytes | None = None  # File content, for platforms that deliver it inline
+
+    @property
+    def timestamp(self) -> datetime:
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
+
+
+class AsyncDeque[T]:
+    """Bounded FIFO handoff from an adapter's callbacks to its listen() loop.
+
+    Same put/get surface as asyncio.Queue, but backed by a deque and two events,
+    without the per-item getter/putter futures Queue manages.
+    """
+
+    def __init__(self, maxsize: int = 0) -> None:
+        self.maxsize = maxsize
+        self._items: deque[T] = deque()
+        self._not_empty = asyncio.Event()
+        self._not_full = asyncio.Event()
+        self._not_full.set()
+
+    def qsize(self) -> int:
+        return len(self._items)
+
+    def empty(self) -> bool:
+        return not self._items
+
+    def full(self) -> bool:
+        return 0 < self.maxsize <= len(self._items)
+
+    def put_nowait(self, item: T) -> None:
+        if self.full():
+            raise asyncio.QueueFull
+        self._items.append(item)
+        self._not_empty.set()
+        if self.full():
+            self._not_full.clear()
+
+    async def put(self, item: T) -> None:
+        # Re-check after waking: another producer may have filled it again
+        while self.full():
+            await self._not_full.wait()
+        self.put_nowait(item)
+
+    def get_nowait(self) -> T:
+        if not self._items:
+            raise asyncio.QueueEmpty
+        item = self._items.popleft()
+        if not self._items:
+            self._not_empty.clear()
+        self._not_full.set()
+        return item
+
+    async def get(self) -> T:
+        while not self._items:
+            await self._not_empty.wait()
+        return self.get_nowait()
+
+
+async def enqueue(
+    queue: AsyncDeque[FileMessage] | asyncio.Queue[FileMessage], file_message: FileMessage
+) -> None:
+    """Put a file on an adapter queue, only yielding to the loop when it is full."""
+    try:
+        queue.put_nowait(file_message)
+    except asyncio.QueueFull:
+        await queue.put(file_message)
 
 
 class BaseAdapter(ABC):
     platform_name: str = "unknown"
+    # Whether download_stream() is implemented, letting uploads skip the temp file
+    supports_streaming: bool = False
+    # Whether FileMessage.size is reported by the server rather than the sender,
+    # so it can be trusted as the Content-Length of a streamed upload
+    exact_sizes: bool = False
 
     @abstractmethod
     async def connect(self) -> None:
@@ -38,3 +112,7 @@ class BaseAdapter(ABC):
     @abstractmethod
     async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
         pass
+
+    async def download_stream(self, file_message: FileMessage) -> AsyncIterator[bytes]:
+        raise NotImplementedError(f"{self.platform_name} adapter cannot stream downloads")
+        yield  # type: ignore
@@ -2,7 +2,6 @@ import asyncio
 import logging
 import sys
 from collections.abc import AsyncIterator
-from datetime import datetime, timezone
 from pathlib import Path
 
 import aiofiles
@@ -15,7 +14,9 @@ from nio import (
     RoomMessageAudio,
     RoomMessageFile,
     RoomMessageImage,
+    RoomMemberEvent,
     RoomMessageVideo,
+    RoomNameEvent,
     SyncError,
     SyncResponse,
     WhoamiError,
@@ -23,7 +24,8 @@ from nio import (
 )
 
 from ..config import MatrixConfig
-from .base import BaseAdapter, FileMessage
+from ._http import make_session
+from .base import AsyncDeque, BaseAdapter, FileMessage, enqueue
 
 logger = logging.getLogger(__name__)
 
@@ -46,8 +48,9 @@ def _check_encryption_dependencies() -> bool:
 
 class MatrixAdapter(BaseAdapter):
     platform_name = "matrix"
+    supports_streaming = True
 
-    def __init__(self, config: MatrixConfig):
+    def __init__(self, config: MatrixConfig, queue_size: int = 32):
         self.config = config
 
         if config.encryption:
@@ -70,21 +73,38 @@ class MatrixAdapter(BaseAdapter):
 
         self.client.access_token = config.access_token
 
-        self._file_queue: asyncio.Queue[FileMessage] = asyncio.Queue()
+        self._file_queue: AsyncDeque[FileMessage] = AsyncDeque(maxsize=queue_size)
+        # Files seen during connect()'s initial sync. listen() isn't draining the
+        # queue yet, so waiting on a full one there would hang connect()
+        self._initial_files: list[FileMessage] | None = None
         self._running = False
+        self._http: aiohttp.ClientSession | None = None
+        self._media_base = f"{config.homeserver}/_matrix/media/r0/download"
+
+        # Resolving names walks room member state, so memoize per room/sender
+        self._name_cache: dict[tuple[str, str], str] = {}
+        self._room_name_cache: dict[str, str] = {}
 
     async def connect(self) -> None:
         # Verify credentials first
         await self._verify_credentials()
 
+        # Reused for every media download so keep-alive connections are pooled
+        self._http = make_session()
+        # Must be known before the initial sync queues any files
+        await self._detect_media_api()
+
         self.client.add_event_callback(self._on_invite, InviteMemberEvent)
         self.client.add_event_callback(self._on_message, RoomMessageImage)
         self.client.add_event_callback(self._on_message, RoomMessageVideo)
         self.client.add_event_callback(self._on_message, RoomMessageAudio)
         self.client.add_event_callback(self._on_message, RoomMessageFile)
+        self.client.add_event_callback(self._on_member_change, RoomMemberEvent)
+        self.client.add_event_callback(self._on_room_name_change, RoomNameEvent)
 
         # Initial sync
         logger.info("Starting initial sync (this may take a moment)...")
+        self._initial_files = []
         response = await self.client.sync(timeout=30000, full_state=True)
 
         if isinstance(response, SyncError):
@@ -125,8 +145,31 @@ class MatrixAdapter(BaseAdapter):
 
         logger.info(f"Credentials verified for {response.user_id}")
 
+    async def _detect_media_api(self) -> None:
+        """Use authenticated media (Matrix v1.11) when the homeserver supports it."""
+        try:
+            async with self._http.get(
+                f"{self.config.homeserver}/_matrix/client/versions"
+            ) as response:
+                response.raise_for_status()
+                versions = (await response.json()).get("versions", [])
+        except Exception as e:
+            logger.debug(f"Could not fetch supported Matrix versions: {e}")
+            return
+
+        if "v1.11" in versions:
+            self._media_base = f"{self.config.homeserver}/_matrix/client/v1/media/download"
+            logger.debug("Using authenticated media endpoint")
+
+    def _media_url(self, mxc_url: str) -> str:
+        server_name, media_id = mxc_url[6:].split("/", 1)
+        return f"{self._media_base}/{server_name}/{media_id}"
+
     async def disconnect(self) -> None:
         self._running = False
+        if self._http:
+            await self._http.close()
+            self._http = None
         await self.client.close()
         logger.info("Disconnected from Matrix")
 
@@ -135,6 +178,29 @@ class MatrixAdapter(BaseAdapter):
             await self.client.join(room.room_id)
             logger.info(f"Joined room: {room.display_name} ({room.room_id})")
 
+    async def _on_member_change(self, room: MatrixRoom, event: RoomMemberEvent) -> None:
+        self._name_cache.pop((room.room_id, event.state_key), None)
+        # Unnamed rooms derive their display name from members
+        self._room_name_cache.pop(room.room_id, None)
+
+    async def _on_room_name_change(self, room: MatrixRoom, event: RoomNameEvent) -> None:
+        self._room_name_cache.pop(room.room_id, None)
+
+    def _sender_name(self, room: MatrixRoom, sender: str) -> str:
+        key = (room.room_id, sender)
+        name = self._name_cache.get(key)
+        if name is None:
+            name = room.user_name(sender) or sender
+            self._name_cache[key] = name
+        return name
+
+    def _room_name(self, room: MatrixRoom) -> str:
+        name = self._room_name_cache.get(room.room_id)
+        if name is None:
+            name = room.display_name or room.room_id
+            self._room_name_cache[room.room_id] = name
+        return name
+
     async def _on_message(
         self,
         room: MatrixRoom,
@@ -153,42 +219,41 @@ class MatrixAdapter(BaseAdapter):
         mimetype = file_info.get("mimetype", "application/octet-stream")
         size = file_info.get("size", 0)
 
-        timestamp = datetime.fromtimestamp(event.server_timestamp / 1000, tz=timezone.utc)
-
-        sender_name = room.user_name(event.sender) or event.sender
+        sender_name = self._sender_name(room, event.sender)
+        room_name = self._room_name(room)
 
         file_message = FileMessage(
             platform=self.platform_name,
             room_id=room.room_id,
-            room_name=room.display_name or room.room_id,
+            room_name=room_name,
             sender_id=event.sender,
             sender_name=sender_name,
             filename=event.body,
             mimetype=mimetype,
             size=size,
-            timestamp=timestamp,
-            download_url=url,
+            timestamp_ms=event.server_timestamp,
+            download_url=self._media_url(url),
             message_id=event.event_id,
         )
 
-        await self._file_queue.put(file_message)
-        logger.debug(f"Queued file: {event.body} from {sender_name} in {room.display_name}")
+        if self._initial_files is not None:
+            self._initial_files.append(file_message)
+        else:
+            await enqueue(self._file_queue, file_message)
+        logger.debug(f"Queued file: {event.body} from {sender_name} in {room_name}")
 
     async def listen(self) -> AsyncIterator[FileMessage]:
         self._running = True
+        # From here on the queue is drained, so live syncs can wait on it
+        initial_files, self._initial_files = self._initial_files or [], None
 
         sync_task = asyncio.create_task(self._sync_forever())
 
         try:
-            while self._running:
-                try:
-                    file_message = await asyncio.wait_for(
-                        self._file_queue.get(),
-                        timeout=1.0,
-                    )
-                    yield file_message
-                except asyncio.TimeoutError:
-                    continue
+            for file_message in initial_files:
+                yield file_message
+            while True:
+                yield await self._file_queue.get()
         finally:
             sync_task.cancel()
             try:
@@ -197,32 +262,44 @@ class MatrixAdapter(BaseAdapter):
                 pass
 
     async def _sync_forever(self) -> None:
+        backoff = 1.0
         while self._running:
             try:
-                await self.client.sync(timeout=30000)
+                response = await self.client.sync(timeout=30000)
             except Exception as e:
                 logger.error(f"Sync error: {e}")
-                await asyncio.sleep(5)
+            else:
+                if not isinstance(response, SyncError):
+                    backoff = 1.0
+                    continue
+                logger.error(f"Sync error: {response.message}")
 
-    async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
-        mxc_url = file_message.download_url
+            # Back off exponentially while the homeserver is failing
+            await asyncio.sleep(backoff)
+            backoff = min(backoff * 2, 60.0)
 
-        parts = mxc_url[6:].split("/", 1)
-        server_name = parts[0]
-        media_id = parts[1]
+    async def download_stream(self, file_message: FileMessage) -> AsyncIterator[bytes]:
+        if not self._http:
+            raise RuntimeError("Not connected to Matrix")
 
-        download_url = (
-            f"{self.config.homeserver}/_matrix/media/r0/download/{server_name}/{media_id}"
-        )
+        # Already resolved from the mxc:// URL when the event was received
+        download_url = file_message.download_url
+        headers = {"Authorization": f"Bearer {self.config.access_token}"}
+
+        async with self._http.get(download_url, headers=headers) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_any():
+                yield chunk
+
+    async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
+        if not self._http:
+            raise RuntimeError("Not connected to Matrix")
 
         destination.parent.mkdir(parents=True, exist_ok=True)
 
-        async with aiohttp.ClientSession() as session:
-            async with session.get(download_url) as response:
-                response.raise_for_status()
-                async with aiofiles.open(destination, "wb") as f:
-                    async for chunk in response.content.iter_chunked(8192):
-                        await f.write(chunk)
+        async with aiofiles.open(destination, "wb") as f:
+            async for chunk in self.download_stream(file_message):
+                await f.write(chunk)
 
         logger.debug(f"Downloaded {file_message.filename} to {destination}")
         return destination
@@ -1,22 +1,32 @@
 import asyncio
 import base64
 import logging
+import mimetypes
+import time
 from collections.abc import AsyncIterator
-from datetime import datetime, timezone
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 from pathlib import Path
 
 from signalbot import Command, Context, SignalBot
 
 from ..config import SignalConfig
-from .base import BaseAdapter, FileMessage
+from .base import AsyncDeque, BaseAdapter, FileMessage, enqueue
 
 logger = logging.getLogger(__name__)
 
+mimetypes.init()
+
+
+@lru_cache(maxsize=256)
+def _guess_mime(filename: str) -> str:
+    return mimetypes.guess_type(filename)[0] or "application/octet-stream"
+
 
 class FileCollectorCommand(Command):
     """Command that collects all messages with attachments."""
 
-    def __init__(self, file_queue: asyncio.Queue[FileMessage]) -> None:
+    def __init__(self, file_queue: AsyncDeque[FileMessage]) -> None:
         super().__init__()
         self._file_queue = file_queue
 
@@ -24,14 +34,15 @@ class FileCollectorCommand(Command):
         message = context.message
 
         # Log all messages for debugging
-        source = message.source or "unknown"
-        group = message.group or "private"
-        has_attachments = bool(message.base64_attachments)
-
-        logger.debug(
-            f"[Signal] Message from '{source}' in '{group}': "
-            f"text={len(message.text or '')} chars, has_attachments={has_attachments}"
-        )
+        if logger.isEnabledFor(logging.DEBUG):
+            source = message.source or "unknown"
+            group = message.group or "private"
+            has_attachments = bool(message.base64_attachments)
+
+            logger.debug(
+                f"[Signal] Message from '{source}' in '{group}': "
+                f"text={len(message.text or '')} chars, has_attachments={has_attachments}"
+            )
 
         # Check if message has attachments
         if not message.base64_attachments:
@@ -49,9 +60,8 @@ class FileCollectorCommand(Command):
         sender_id = message.source_uuid or message.source or "unknown"
         sender_name = message.source or "unknown"
 
-        timestamp = datetime.fromtimestamp(
-            message.timestamp / 1000, tz=timezone.utc
-        ) if message.timestamp else datetime.now(timezone.utc)
+        # Signal timestamps are already epoch milliseconds
+        timestamp_ms = message.timestamp or time.time_ns() // 1_000_000
 
         # Process each attachment
         filenames = message.attachments_local_filenames or []
@@ -64,30 +74,15 @@ class FileCollectorCommand(Command):
                 filename = f"attachment_{message.timestamp}_{i}"
 
             # Try to determine mimetype from filename
-            mimetype = "application/octet-stream"
-            ext = Path(filename).suffix.lower()
-            mime_map = {
-                ".jpg": "image/jpeg",
-                ".jpeg": "image/jpeg",
-                ".png": "image/png",
-                ".gif": "image/gif",
-                ".webp": "image/webp",
-                ".mp4": "video/mp4",
-                ".mov": "video/quicktime",
-                ".mp3": "audio/mpeg",
-                ".ogg": "audio/ogg",
-                ".pdf": "application/pdf",
-                ".doc": "application/msword",
-                ".docx": "application/vnd.openxmlformats-officedocument.wordprocessingml.document",
-            }
-            if ext in mime_map:
-                mimetype = mime_map[ext]
-
-            # Calculate size from base64 data
+            mimetype = _guess_mime(filename)
+
+            # Decode once here, in a worker thread so large attachments don't
+            # stall the loop; download_file writes these bytes as-is
             try:
-                decoded = base64.b64decode(b64_data)
-                size = len(decoded)
+                payload = await asyncio.to_thread(base64.b64decode, b64_data)
+                size = len(payload)
             except Exception:
+                payload = None
                 size = 0
 
             file_message = FileMessage(
@@ -99,12 +94,14 @@ class FileCollectorCommand(Command):
                 filename=filename,
                 mimetype=mimetype,
                 size=size,
-                timestamp=timestamp,
-                download_url=b64_data,  # Store base64 data as download_url
+                timestamp_ms=timestamp_ms,
+                # Keep the base64 data only if it could not be decoded
+                download_url="" if payload is not None else b64_data,
                 message_id=str(message.timestamp),
+                payload=payload,
             )
 
-            await self._file_queue.put(file_message)
+            await enqueue(self._file_queue, file_message)
             logger.info(
                 f"[Signal] File received: {filename} ({size} bytes) "
                 f"from {sender_name} in {room_name}"
@@ -114,12 +111,13 @@ class FileCollectorCommand(Command):
 class SignalAdapter(BaseAdapter):
     platform_name = "signal"
 
-    def __init__(self, config: SignalConfig):
+    def __init__(self, config: SignalConfig, queue_size: int = 32):
         self.config = config
         self.bot: SignalBot | None = None
-        self._file_queue: asyncio.Queue[FileMessage] = asyncio.Queue()
-        self._running = False
+        self._file_queue: AsyncDeque[FileMessage] = AsyncDeque(maxsize=queue_size)
         self._bot_task: asyncio.Task | None = None
+        # signalbot.start() never returns, so keep it out of the default executor
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="signalbot")
 
     async def connect(self) -> None:
         logger.info("Connecting to Signal...")
@@ -143,47 +141,37 @@ class SignalAdapter(BaseAdapter):
         try:
             # signalbot.start() is blocking, run it in executor
             loop = asyncio.get_event_loop()
-            await loop.run_in_executor(None, self.bot.start)
+            await loop.run_in_executor(self._executor, self.bot.start)
         except Exception as e:
             logger.error(f"Signal bot error: {e}")
 
     async def disconnect(self) -> None:
-        self._running = False
         if self._bot_task:
             self._bot_task.cancel()
             try:
                 await self._bot_task
             except asyncio.CancelledError:
                 pass
+        self._executor.shutdown(wait=False, cancel_futures=True)
         logger.info("Disconnected from Signal")
 
     async def listen(self) -> AsyncIterator[FileMessage]:
-        self._running = True
-
-        try:
-            while self._running:
-                try:
-                    file_message = await asyncio.wait_for(
-                        self._file_queue.get(),
-                        timeout=1.0,
-                    )
-                    yield file_message
-                except asyncio.TimeoutError:
-                    continue
-        finally:
-            pass
+        while True:
+            yield await self._file_queue.get()
 
     async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
-        # The base64 data is stored in download_url
-        b64_data = file_message.download_url
-
         destination.parent.mkdir(parents=True, exist_ok=True)
 
-        try:
-            decoded = base64.b64decode(b64_data)
-            destination.write_bytes(decoded)
-        except Exception as e:
-            raise RuntimeError(f"Failed to decode Signal attachment: {e}") from e
+        payload = file_message.payload
+        if payload is None:
+            # handle() already failed to decode this; decode again, off the loop,
+            # only to report why
+            try:
+                payload = await asyncio.to_thread(base64.b64decode, file_message.download_url)
+            except ValueError as e:
+                raise RuntimeError(f"Failed to decode Signal attachment: {e}") from e
+
+        await asyncio.to_thread(destination.write_bytes, payload)
 
         logger.debug(f"Downloaded {file_message.filename} to {destination}")
         return destination
@@ -1,26 +1,102 @@
-import asyncio
 import logging
-from collections.abc import AsyncIterator
-from datetime import datetime, timezone
+import time
+from collections.abc import AsyncIterator, Callable
+from datetime import timezone
 from pathlib import Path
+from typing import Any
 
-from telegram import Bot, Update
+import aiofiles
+import aiohttp
+from telegram import Bot, Message, Update
 from telegram.ext import Application, ContextTypes, MessageHandler, filters
 
 from ..config import TelegramConfig
-from .base import BaseAdapter, FileMessage
+from ._http import make_session
+from .base import AsyncDeque, BaseAdapter, FileMessage, enqueue
 
 logger = logging.getLogger(__name__)
 
+FileInfo = tuple[str, str, str, int]
+
+
+def _extract_document(document: Any, message: Message) -> FileInfo:
+    return (
+        document.file_id,
+        document.file_name or "document",
+        document.mime_type or "application/octet-stream",
+        document.file_size or 0,
+    )
+
+
+def _extract_photo(photo: Any, message: Message) -> FileInfo:
+    # Get largest photo
+    largest = photo[-1]
+    return (
+        largest.file_id,
+        f"photo_{message.message_id}.jpg",
+        "image/jpeg",
+        largest.file_size or 0,
+    )
+
+
+def _extract_video(video: Any, message: Message) -> FileInfo:
+    return (
+        video.file_id,
+        video.file_name or f"video_{message.message_id}.mp4",
+        video.mime_type or "video/mp4",
+        video.file_size or 0,
+    )
+
+
+def _extract_audio(audio: Any, message: Message) -> FileInfo:
+    return (
+        audio.file_id,
+        audio.file_name or f"audio_{message.message_id}.mp3",
+        audio.mime_type or "audio/mpeg",
+        audio.file_size or 0,
+    )
+
+
+def _extract_voice(voice: Any, message: Message) -> FileInfo:
+    return (
+        voice.file_id,
+        f"voice_{message.message_id}.ogg",
+        voice.mime_type or "audio/ogg",
+        voice.file_size or 0,
+    )
+
+
+def _extract_video_note(video_note: Any, message: Message) -> FileInfo:
+    return (
+        video_note.file_id,
+        f"video_note_{message.message_id}.mp4",
+        "video/mp4",
+        video_note.file_size or 0,
+    )
+
+
+# Checked in order; the first attribute present on the message wins
+_EXTRACTORS: tuple[tuple[str, Callable[[Any, Message], FileInfo]], ...] = (
+    ("document", _extract_document),
+    ("photo", _extract_photo),
+    ("video", _extract_video),
+    ("audio", _extract_audio),
+    ("voice", _extract_voice),
+    ("video_note", _extract_video_note),
+)
+
 
 class TelegramAdapter(BaseAdapter):
     platform_name = "telegram"
+    supports_streaming = True
+    # file_size comes from Telegram's servers
+    exact_sizes = True
 
-    def __init__(self, config: TelegramConfig):
+    def __init__(self, config: TelegramConfig, queue_size: int = 32):
         self.config = config
         self.application: Application | None = None
-        self._file_queue: asyncio.Queue[FileMessage] = asyncio.Queue()
-        self._running = False
+        self._http: aiohttp.ClientSession | None = None
+        self._file_queue: AsyncDeque[FileMessage] = AsyncDeque(maxsize=queue_size)
 
     async def connect(self) -> None:
         logger.info("Connecting to Telegram...")
@@ -55,15 +131,23 @@ class TelegramAdapter(BaseAdapter):
         await self.application.start()
         await self.application.updater.start_polling(drop_pending_updates=True)
 
+        # File contents are fetched directly so keep-alive connections are reused
+        self._http = make_session()
+
         bot_info = await self.application.bot.get_me()
         logger.info(f"Connected to Telegram as @{bot_info.username}")
 
     async def disconnect(self) -> None:
-        self._running = False
         if self.application:
-            await self.application.updater.stop()
-            await self.application.stop()
+            # connect() may have failed part-way; stopping what never started raises
+            if self.application.updater and self.application.updater.running:
+                await self.application.updater.stop()
+            if self.application.running:
+                await self.application.stop()
             await self.application.shutdown()
+        if self._http:
+            await self._http.close()
+            self._http = None
         logger.info("Disconnected from Telegram")
 
     async def _on_any_message(
@@ -72,6 +156,10 @@ class TelegramAdapter(BaseAdapter):
         context: ContextTypes.DEFAULT_TYPE,
     ) -> None:
         """Log all messages for debugging."""
+        # Telegram delivers every message here, so skip the formatting unless it's shown
+        if not logger.isEnabledFor(logging.DEBUG):
+            return
+
         if not update.message:
             logger.debug(f"Received update without message: {update}")
             return
@@ -132,43 +220,13 @@ class TelegramAdapter(BaseAdapter):
         chat = message.chat
 
         # Determine file info based on message type
-        file_id: str | None = None
-        filename: str = "file"
-        mimetype: str = "application/octet-stream"
-        size: int = 0
-
-        if message.document:
-            file_id = message.document.file_id
-            filename = message.document.file_name or "document"
-            mimetype = message.document.mime_type or mimetype
-            size = message.document.file_size or 0
-        elif message.photo:
-            # Get largest photo
-            photo = message.photo[-1]
-            file_id = photo.file_id
-            filename = f"photo_{message.message_id}.jpg"
-            mimetype = "image/jpeg"
-            size = photo.file_size or 0
-        elif message.video:
-            file_id = message.video.file_id
-            filename = message.video.file_name or f"video_{message.message_id}.mp4"
-            mimetype = message.video.mime_type or "video/mp4"
-            size = message.video.file_size or 0
-        elif message.audio:
-            file_id = message.audio.file_id
-            filename = message.audio.file_name or f"audio_{message.message_id}.mp3"
-            mimetype = message.audio.mime_type or "audio/mpeg"
-            size = message.audio.file_size or 0
-        elif message.voice:
-            file_id = message.voice.file_id
-            filename = f"voice_{message.message_id}.ogg"
-            mimetype = message.voice.mime_type or "audio/ogg"
-            size = message.voice.file_size or 0
-        elif message.video_note:
-            file_id = message.video_note.file_id
-            filename = f"video_note_{message.message_id}.mp4"
-            mimetype = "video/mp4"
-            size = message.video_note.file_size or 0
+        for attr, extract in _EXTRACTORS:
+            obj = getattr(message, attr)
+            if obj:
+                file_id, filename, mimetype, size = extract(obj, message)
+                break
+        else:
+            return
 
         if not file_id:
             return
@@ -190,7 +248,10 @@ class TelegramAdapter(BaseAdapter):
             sender_name = "unknown"
             sender_id = "unknown"
 
-        timestamp = message.date.replace(tzinfo=timezone.utc) if message.date else datetime.now(timezone.utc)
+        if message.date:
+            timestamp_ms = int(message.date.replace(tzinfo=timezone.utc).timestamp() * 1000)
+        else:
+            timestamp_ms = time.time_ns() // 1_000_000
 
         file_message = FileMessage(
             platform=self.platform_name,
@@ -201,40 +262,49 @@ class TelegramAdapter(BaseAdapter):
             filename=filename,
             mimetype=mimetype,
             size=size,
-            timestamp=timestamp,
+            timestamp_ms=timestamp_ms,
             download_url=file_id,  # Store file_id as download_url
             message_id=str(message.message_id),
         )
 
-        await self._file_queue.put(file_message)
+        await enqueue(self._file_queue, file_message)
         logger.info(f"[TG] File received: {filename} ({size} bytes) from {sender_name} in {room_name}")
 
     async def listen(self) -> AsyncIterator[FileMessage]:
-        self._running = True
-
-        try:
-            while self._running:
-                try:
-                    file_message = await asyncio.wait_for(
-                        self._file_queue.get(),
-                        timeout=1.0,
-                    )
-                    yield file_message
-                except asyncio.TimeoutError:
-                    continue
-        finally:
-            pass
+        while True:
+            yield await self._file_queue.get()
 
-    async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
-        if not self.application:
+    async def download_stream(self, file_message: FileMessage) -> AsyncIterator[bytes]:
+        if not self.application or not self._http:
             raise RuntimeError("Not connected to Telegram")
 
         file_id = file_message.download_url  # We stored file_id here
 
+        # get_file resolves the id to a full https://api.telegram.org/file/... URL
+        tg_file = await self.application.bot.get_file(file_id)
+        if not tg_file.file_path:
+            raise RuntimeError(f"Telegram returned no file path for {file_id}")
+
+        async with self._http.get(tg_file.file_path) as response:
+            try:
+                response.raise_for_status()
+            except aiohttp.ClientResponseError as e:
+                # The error text includes the URL, which embeds the bot token
+                raise RuntimeError(
+                    f"Telegram download of {file_id} failed: HTTP {e.status}"
+                ) from None
+            async for chunk in response.content.iter_any():
+                yield chunk
+
+    async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
+        if not self.application or not self._http:
+            raise RuntimeError("Not connected to Telegram")
+
         destination.parent.mkdir(parents=True, exist_ok=True)
 
-        tg_file = await self.application.bot.get_file(file_id)
-        await tg_file.download_to_drive(destination)
+        async with aiofiles.open(destination, "wb") as f:
+            async for chunk in self.download_stream(file_message):
+                await f.write(chunk)
 
         logger.debug(f"Downloaded {file_message.filename} to {destination}")
         return destination
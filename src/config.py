@@ -1,9 +1,16 @@
+import os
+import threading
 from dataclasses import dataclass, field
 from pathlib import Path
 from typing import Any
 
 import yaml
 
+try:
+    from yaml import CSafeLoader as _SafeLoader
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader
+
 
 @dataclass
 class NextcloudConfig:
@@ -47,6 +54,8 @@ class Config:
     nextcloud: NextcloudConfig
     path_template: str
     adapters: AdaptersConfig
+    download_concurrency: int = 4
+    queue_size: int = 32
 
     @classmethod
     def from_dict(cls, data: dict[str, Any]) -> "Config":
@@ -93,15 +102,34 @@ class Config:
             nextcloud=nextcloud,
             path_template=data.get("path_template", "{platform}/{room}/{filename}"),
             adapters=adapters,
+            download_concurrency=data.get("download_concurrency", 4),
+            queue_size=data.get("queue_size", 32),
         )
 
     @classmethod
     def load(cls, path: str | Path) -> "Config":
         path = Path(path)
-        if not path.exists():
-            raise FileNotFoundError(f"Configuration file not found: {path}")
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            raise FileNotFoundError(f"Configuration file not found: {path}") from None
+
+        # Any edit or atomic replace changes at least one of these fields
+        key = (str(path), st.st_mtime_ns, st.st_size, st.st_ino)
+        with _CONFIG_CACHE_LOCK:
+            cached = _CONFIG_CACHE.get(key)
+        if cached is not None:
+            return cached
 
         with open(path) as f:
-            data = yaml.safe_load(f)
+            data = yaml.load(f, Loader=_SafeLoader)
+
+        config = cls.from_dict(data)
+
+        with _CONFIG_CACHE_LOCK:
+            _CONFIG_CACHE[key] = config
+        return config
+
 
-        return cls.from_dict(data)
+_CONFIG_CACHE: dict[tuple[str, int, int, int], Config] = {}
+_CONFIG_CACHE_LOCK = threading.Lock()
@@ -1,22 +1,59 @@
+import asyncio
+import inspect
 import logging
-import tempfile
+from collections.abc import Iterable, Iterator
 from pathlib import Path
 
+import aiofiles.tempfile
+
 from .adapters.base import BaseAdapter, FileMessage
-from .path_resolver import FileMetadata, resolve_path
-from .uploader import NextcloudUploader
+from .path_resolver import FileMetadata, ResolvedPath, resolve_path
+from .uploader import DryRunUploader, NextcloudAsyncUploader, NextcloudUploader
 
 logger = logging.getLogger(__name__)
 
+# Marks the end of a streamed download in the chunk pipe
+_END = object()
+
+
+def _mark_retrieved(task: asyncio.Future) -> None:
+    # Only one side's error gets reported; don't warn about the other one
+    if not task.cancelled():
+        task.exception()
+
 
 class FileProcessor:
     def __init__(
         self,
-        uploader: NextcloudUploader,
+        uploader: NextcloudUploader | NextcloudAsyncUploader | DryRunUploader,
         path_template: str,
+        max_downloads: int = 8,
+        max_concurrency: int = 8,
     ):
         self.uploader = uploader
         self.path_template = path_template
+        # Shared by every adapter so bursts can't exhaust sockets/file descriptors
+        self._download_sem = asyncio.BoundedSemaphore(max_downloads)
+        # Limits process_many's download+upload pipelines; callers that run
+        # their own worker pool are bounded by its size instead
+        self._sem = asyncio.Semaphore(max_concurrency)
+        # Async uploaders are awaited directly; blocking ones go through a thread
+        self._async_upload = inspect.iscoroutinefunction(uploader.upload_file)
+
+    async def process_many(
+        self, adapter: BaseAdapter, file_messages: Iterable[FileMessage]
+    ) -> list[str | None]:
+        """Process several files concurrently, up to max_concurrency at a time."""
+        async def limited(file_message: FileMessage) -> str | None:
+            async with self._sem:
+                return await self.process_file(adapter, file_message)
+
+        async with asyncio.TaskGroup() as tg:
+            tasks = [
+                tg.create_task(limited(file_message))
+                for file_message in file_messages
+            ]
+        return [task.result() for task in tasks]
 
     async def process_file(self, adapter: BaseAdapter, file_message: FileMessage) -> str | None:
         try:
@@ -28,19 +65,54 @@ class FileProcessor:
                 timestamp=file_message.timestamp,
             )
 
+            # Cached per sender/room/minute, so bursts render the template once
             remote_path = resolve_path(self.path_template, metadata)
+            # Only a server-reported size is sent as Content-Length; otherwise the
+            # upload is chunked (adapters report 0 when no size is known)
+            size = (file_message.size or None) if adapter.exact_sizes else None
 
-            with tempfile.TemporaryDirectory() as temp_dir:
-                local_path = Path(temp_dir) / file_message.filename
+            if file_message.payload is not None:
+                # Already in memory; a temp file round-trip would be pure overhead
+                if self._async_upload:
+                    uploaded_path = await self.uploader.upload_bytes(
+                        file_message.payload, remote_path
+                    )
+                else:
+                    uploaded_path = await asyncio.to_thread(
+                        self.uploader.upload_bytes, file_message.payload, remote_path
+                    )
+            elif adapter.supports_streaming and self._async_upload:
+                async with self._download_sem:
+                    uploaded_path = await self.uploader.upload_stream(
+                        adapter.download_stream(file_message), remote_path, size=size
+                    )
+            elif adapter.supports_streaming:
+                uploaded_path = await self._stream_file(
+                    adapter, file_message, remote_path, size
+                )
+            else:
+                # Creating and removing the directory runs in a thread, off the loop
+                async with aiofiles.tempfile.TemporaryDirectory() as temp_dir:
+                    local_path = Path(temp_dir) / file_message.filename
 
-                await adapter.download_file(file_message, local_path)
+                    async with self._download_sem:
+                        await adapter.download_file(file_message, local_path)
 
-                uploaded_path = self.uploader.upload_file(local_path, remote_path)
+                    if self._async_upload:
+                        uploaded_path = await self.uploader.upload_file(local_path, remote_path)
+                    else:
+                        # webdav3 is blocking; keep the event loop free during the upload
+                        uploaded_path = await asyncio.to_thread(
+                            self.uploader.upload_file, local_path, remote_path
+                        )
 
+            # The one INFO line per upload; the uploader only logs at DEBUG
             logger.info(
-                f"Processed: {file_message.filename} "
-                f"from {file_message.sender_name} "
-                f"in {file_message.room_name} -> {uploaded_path}"
+                "Processed: %s from %s in %s -> %s",
+                file_message.filename,
+                file_message.sender_name,
+                file_message.room_name,
+                uploaded_path,
             )
             return uploaded_path
 
@@ -50,3 +122,61 @@ class FileProcessor:
                 f"from {file_message.room_name}: {e}"
             )
             return None
+
+    async def _stream_file(
+        self,
+        adapter: BaseAdapter,
+        file_message: FileMessage,
+        remote_path: ResolvedPath,
+        size: int | None = None,
+    ) -> str:
+        """Pipe the adapter's download straight into the upload, without a temp file.
+
+        The upload runs in a worker thread and pulls chunks from a small queue
+        that the download fills, so both transfers proceed at the same time.
+        """
+        loop = asyncio.get_running_loop()
+        pipe: asyncio.Queue[object] = asyncio.Queue(maxsize=8)
+
+        def chunks() -> Iterator[bytes]:
+            while True:
+                item = asyncio.run_coroutine_threadsafe(pipe.get(), loop).result()
+                if item is _END:
+                    return
+                if isinstance(item, BaseException):
+                    # Abort the PUT so a partial file is never committed
+                    raise item
+                yield item
+
+        async def produce() -> None:
+            try:
+                async for chunk in adapter.download_stream(file_message):
+                    await pipe.put(chunk)
+            except Exception as e:
+                await pipe.put(e)
+                raise
+            await pipe.put(_END)
+
+        async with self._download_sem:
+            upload = asyncio.ensure_future(
+                asyncio.to_thread(
+                    self.uploader.upload_stream, chunks(), remote_path, size=size
+                )
+            )
+            download = asyncio.ensure_future(produce())
+            for task in (upload, download):
+                task.add_done_callback(_mark_retrieved)
+            try:
+                await asyncio.wait({upload, download}, return_when=asyncio.FIRST_EXCEPTION)
+                if download.done() and download.exception():
+                    # The upload thread has been handed the error; let it unwind
+                    await asyncio.wait({upload})
+                    raise download.exception()
+                return await upload
+            finally:
+                download.cancel()
+                if not upload.done():
+                    # Never leave the upload thread blocked on an empty pipe
+                    while not pipe.empty():
+                        pipe.get_nowait()
+                    pipe.put_nowait(RuntimeError("Download aborted"))
@@ -1,9 +1,19 @@
+import os
 import re
+import time
+from collections.abc import Callable
 from dataclasses import dataclass
 from datetime import datetime
+from functools import lru_cache
+from typing import NamedTuple
 
+# str.translate is much cheaper than a regex for a fixed character class
+_SAN_TABLE = str.maketrans(dict.fromkeys('<>:"/\\|?*', "_"))
+_UNDERSCORE_RUN_RE = re.compile(r"_+")
+_PLACEHOLDER_RE = re.compile(r"\{(\w+)\}")
 
-@dataclass
+
+@dataclass(slots=True, frozen=True)
 class FileMetadata:
     platform: str
     room: str
@@ -12,42 +22,139 @@ class FileMetadata:
     timestamp: datetime | None = None
 
 
+# Last datetime.now() fallback, reused for up to a second
+_now_cache: tuple[float, datetime] = (float("-inf"), datetime.min)
+
+
+def _now() -> datetime:
+    # Fallback timestamps only feed minute-level path fields, so a slightly
+    # stale value is fine and saves a clock read per file during bursts
+    global _now_cache
+    t = time.monotonic()
+    if t - _now_cache[0] > 1.0:
+        _now_cache = (t, datetime.now())
+    return _now_cache[1]
+
+
+class ResolvedPath(NamedTuple):
+    """A rendered remote path, split once so uploaders needn't re-parse it."""
+
+    full: str
+    parent: str  # Empty when the path has no directory part
+    name: str
+
+    @classmethod
+    def of(cls, path: "str | ResolvedPath") -> "ResolvedPath":
+        if isinstance(path, ResolvedPath):
+            return path
+        parent, _, name = path.rpartition("/")
+        return cls(path, parent, name)
+
+
 def sanitize_path_component(name: str) -> str:
-    sanitized = re.sub(r'[<>:"/\\|?*]', "_", name)
-    sanitized = sanitized.strip(". ")
-    sanitized = re.sub(r"_+", "_", sanitized)
+    sanitized = name.translate(_SAN_TABLE).strip(". ")
+    if "__" in sanitized:
+        sanitized = _UNDERSCORE_RUN_RE.sub("_", sanitized)
     return sanitized or "unknown"
 
 
-def resolve_path(template: str, metadata: FileMetadata) -> str:
-    ts = metadata.timestamp or datetime.now()
-
-    filename = metadata.filename
-    ext = ""
-    if "." in filename:
-        parts = filename.rsplit(".", 1)
-        filename_base = parts[0]
-        ext = parts[1]
-    else:
-        filename_base = filename
-
-    variables = {
-        "platform": sanitize_path_component(metadata.platform),
-        "room": sanitize_path_component(metadata.room),
-        "sender": sanitize_path_component(metadata.sender),
-        "filename": sanitize_path_component(metadata.filename),
-        "filename_base": sanitize_path_component(filename_base),
-        "ext": ext,
-        "date": ts.strftime("%Y-%m-%d"),
-        "year": ts.strftime("%Y"),
-        "month": ts.strftime("%m"),
-        "day": ts.strftime("%d"),
-        "hour": ts.strftime("%H"),
-        "minute": ts.strftime("%M"),
-    }
-
-    result = template
-    for key, value in variables.items():
-        result = result.replace("{" + key + "}", value)
-
-    return result
+def _split_filename(filename: str) -> tuple[str, str]:
+    # splitext treats dotfiles like ".bashrc" as having no extension
+    filename_base, ext = os.path.splitext(filename)
+    return filename_base, ext[1:]
+
+
+_METADATA_VARIABLES: dict[str, Callable[[FileMetadata], str]] = {
+    "platform": lambda md: sanitize_path_component(md.platform),
+    "room": lambda md: sanitize_path_component(md.room),
+    "sender": lambda md: sanitize_path_component(md.sender),
+    "filename": lambda md: sanitize_path_component(md.filename),
+    "filename_base": lambda md: sanitize_path_component(_split_filename(md.filename)[0]),
+    "ext": lambda md: _split_filename(md.filename)[1],
+}
+
+# Plain int formatting; strftime goes through the locale machinery
+_DATE_VARIABLES: dict[str, Callable[[datetime], str]] = {
+    "date": lambda ts: f"{ts.year:04d}-{ts.month:02d}-{ts.day:02d}",
+    "year": lambda ts: f"{ts.year:04d}",
+    "month": lambda ts: f"{ts.month:02d}",
+    "day": lambda ts: f"{ts.day:02d}",
+    "hour": lambda ts: f"{ts.hour:02d}",
+    "minute": lambda ts: f"{ts.minute:02d}",
+}
+
+
+_DATE_KEYS = frozenset(_DATE_VARIABLES)
+_FILENAME_KEYS = frozenset({"filename", "filename_base", "ext"})
+
+
+@lru_cache(maxsize=64)
+def template_placeholders(template: str) -> frozenset[str]:
+    return frozenset(_PLACEHOLDER_RE.findall(template))
+
+
+def compile_template(template: str) -> Callable[[FileMetadata], ResolvedPath]:
+    """Parse a path template once into a function that renders it for given metadata."""
+    # split() alternates literal text and placeholder names
+    parts = _PLACEHOLDER_RE.split(template)
+    literals = parts[0::2]
+    getters: list[Callable[[FileMetadata, datetime | None], str]] = []
+    # The clock is only read when a date placeholder needs it
+    uses_date = not template_placeholders(template).isdisjoint(_DATE_KEYS)
+
+    for key in parts[1::2]:
+        if key in _METADATA_VARIABLES:
+            getters.append(lambda md, ts, get=_METADATA_VARIABLES[key]: get(md))
+        elif key in _DATE_VARIABLES:
+            getters.append(lambda md, ts, get=_DATE_VARIABLES[key]: get(ts))
+        else:
+            # Unknown placeholders are left as-is
+            getters.append(lambda md, ts, text="{" + key + "}": text)
+
+    def render(metadata: FileMetadata) -> ResolvedPath:
+        ts = (metadata.timestamp or _now()) if uses_date else None
+        out = [literals[0]]
+        for get, literal in zip(getters, literals[1:]):
+            out.append(get(metadata, ts))
+            out.append(literal)
+        return ResolvedPath.of("".join(out))
+
+    return render
+
+
+_compile_cached = lru_cache(maxsize=64)(compile_template)
+
+
+def resolve_path(template: str, metadata: FileMetadata) -> ResolvedPath:
+    needed = template_placeholders(template)
+
+    ts_key = None
+    if not needed.isdisjoint(_DATE_KEYS):
+        ts = metadata.timestamp or _now()
+        # Templates resolve at minute granularity, so bursts within the same
+        # minute share a cache entry
+        ts_key = (ts.year, ts.month, ts.day, ts.hour, ts.minute)
+
+    # Fields the template doesn't use are blanked so they don't split the cache
+    return _resolve_cached(
+        template,
+        metadata.platform if "platform" in needed else "",
+        metadata.room if "room" in needed else "",
+        metadata.sender if "sender" in needed else "",
+        metadata.filename if not needed.isdisjoint(_FILENAME_KEYS) else "",
+        ts_key,
+    )
+
+
+@lru_cache(maxsize=1024)
+def _resolve_cached(
+    template: str,
+    platform: str,
+    room: str,
+    sender: str,
+    filename: str,
+    ts_key: tuple[int, int, int, int, int] | None,
+) -> ResolvedPath:
+    timestamp = datetime(*ts_key) if ts_key else None
+    metadata = FileMetadata(platform, room, sender, filename, timestamp)
+    return _compile_cached(template)(metadata)
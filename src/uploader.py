@@ -1,64 +1,206 @@
+import asyncio
+import base64
 import logging
+import threading
+from collections import OrderedDict
+from collections.abc import AsyncIterable, AsyncIterator, Iterable, Iterator
+from functools import lru_cache
 from pathlib import Path, PurePosixPath
+from urllib.parse import quote
 
+import aiofiles
+import aiohttp
 from webdav3.client import Client
-from webdav3.exceptions import WebDavException
+from webdav3.exceptions import MethodNotSupported, WebDavException
+from webdav3.urn import Urn
 
+from .adapters._http import make_session
 from .config import NextcloudConfig
+from .path_resolver import ResolvedPath
 
 logger = logging.getLogger(__name__)
 
+# Read size for streaming local files into a PUT
+UPLOAD_CHUNK_SIZE = 1 << 20
+
+# No overall deadline, since large uploads can legitimately take a long time;
+# only a stalled connection is given up on
+UPLOAD_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=300)
+
+
+class _KnownDirs:
+    """Bounded set of remote directories known to exist, evicting the least recently used."""
+
+    def __init__(self, maxsize: int = 4096):
+        self.maxsize = maxsize
+        self._dirs: OrderedDict[str, None] = OrderedDict()
+        # Shared by the blocking uploader's worker threads
+        self._lock = threading.Lock()
+
+    def __contains__(self, path: object) -> bool:
+        with self._lock:
+            if path not in self._dirs:
+                return False
+            self._dirs.move_to_end(path)
+            return True
+
+    def __len__(self) -> int:
+        return len(self._dirs)
+
+    def add(self, path: str) -> None:
+        with self._lock:
+            self._dirs[path] = None
+            self._dirs.move_to_end(path)
+            if len(self._dirs) > self.maxsize:
+                self._dirs.popitem(last=False)
+
+
+@lru_cache(maxsize=16)
+def _get_client(hostname: str, login: str, password: str) -> Client:
+    # Uploaders for the same account share one client and its requests session
+    return Client(
+        {
+            "webdav_hostname": hostname,
+            "webdav_login": login,
+            "webdav_password": password,
+        }
+    )
+
+
+def _length_mismatch(received: int, size: int) -> RuntimeError:
+    return RuntimeError(f"Stream length mismatch: got {received} bytes, expected {size}")
+
+
+class _SizedChunks:
+    """Chunk iterator with a known total, so requests sends Content-Length instead of chunking."""
+
+    def __init__(self, chunks: Iterable[bytes], size: int):
+        self._chunks = chunks
+        self._size = size
+
+    def __iter__(self) -> Iterator[bytes]:
+        # Raising aborts the PUT; a body that disagrees with Content-Length
+        # would otherwise be truncated or leave the server waiting
+        received = 0
+        for chunk in self._chunks:
+            received += len(chunk)
+            if received > self._size:
+                raise _length_mismatch(received, self._size)
+            yield chunk
+        if received != self._size:
+            raise _length_mismatch(received, self._size)
+
+    def __len__(self) -> int:
+        return self._size
+
+
+async def _checked_chunks(chunks: AsyncIterable[bytes], size: int) -> AsyncIterator[bytes]:
+    """Async counterpart of _SizedChunks' length check."""
+    received = 0
+    async for chunk in chunks:
+        received += len(chunk)
+        if received > size:
+            raise _length_mismatch(received, size)
+        yield chunk
+    if received != size:
+        raise _length_mismatch(received, size)
+
 
 class NextcloudUploader:
+    """Blocking webdav3 uploader.
+
+    The app itself uses NextcloudAsyncUploader; this one is kept for library
+    use from synchronous code, and FileProcessor still accepts it.
+    """
+
     def __init__(self, config: NextcloudConfig):
         self.config = config
         self.base_path = PurePosixPath(config.base_path)
+        # Plain concatenation in _full_path avoids building a path object per call
+        self._base_prefix = str(self.base_path).rstrip("/") + "/"
 
         webdav_url = config.url.rstrip("/") + "/remote.php/dav/files/" + config.username
 
-        options = {
-            "webdav_hostname": webdav_url,
-            "webdav_login": config.username,
-            "webdav_password": config.password,
-        }
-        self.client = Client(options)
+        self.client = _get_client(webdav_url, config.username, config.password)
+        # Directories known to exist remotely, so repeat uploads skip the MKCOLs
+        self._known_dirs = _KnownDirs()
+        # Per-directory locks so concurrent upload threads create each level once
+        self._dir_locks: dict[str, threading.Lock] = {}
+        self._dir_locks_guard = threading.Lock()
 
     def _full_path(self, relative_path: str) -> str:
-        return str(self.base_path / relative_path)
+        return self._base_prefix + relative_path.lstrip("/")
+
+    def _make_collection(self, path: str) -> None:
+        # Bare MKCOL; Client.mkdir would PROPFIND the parent first
+        try:
+            self.client.execute_request(action="mkdir", path=Urn(path, directory=True).quote())
+            logger.debug(f"Created directory: {path}")
+        except MethodNotSupported:
+            # 405: the collection already exists
+            pass
 
     def ensure_directory(self, remote_path: str) -> None:
         full_path = PurePosixPath(self._full_path(remote_path))
 
-        parts_to_create = []
-        current = full_path
-        while current != PurePosixPath("/"):
-            if not self.client.check(str(current)):
-                parts_to_create.append(current)
-            else:
-                break
-            current = current.parent
-
-        for path in reversed(parts_to_create):
-            try:
-                self.client.mkdir(str(path))
-                logger.debug(f"Created directory: {path}")
-            except WebDavException as e:
-                if "already exists" not in str(e).lower():
-                    raise
+        # Create each level from the top down without checking first; existing
+        # ones just answer 405, which saves a PROPFIND round-trip per level
+        for path in reversed((full_path, *full_path.parents)):
+            key = str(path)
+            if path == PurePosixPath("/") or key in self._known_dirs:
+                continue
+            with self._dir_locks_guard:
+                lock = self._dir_locks.setdefault(key, threading.Lock())
+            with lock:
+                if key in self._known_dirs:
+                    continue
+                self._make_collection(key)
+                self._known_dirs.add(key)
+            with self._dir_locks_guard:
+                self._dir_locks.pop(key, None)
 
-    def upload_file(self, local_path: Path, remote_path: str) -> str:
-        full_remote_path = self._full_path(remote_path)
+    def _prepare_upload(self, remote_path: str | ResolvedPath) -> str:
+        resolved = ResolvedPath.of(remote_path)
+        if resolved.parent:
+            self.ensure_directory(resolved.parent)
 
-        parent_dir = str(PurePosixPath(remote_path).parent)
-        if parent_dir != ".":
-            self.ensure_directory(parent_dir)
+        return self._full_path(resolved.full)
 
-        self.client.upload_sync(
-            remote_path=full_remote_path,
-            local_path=str(local_path),
-        )
+    def _put(self, full_remote_path: str, data: object) -> None:
+        # Bare PUT; Client.upload_to would PROPFIND the parent first, which
+        # ensure_directory has already taken care of
+        self.client.execute_request(action="upload", path=Urn(full_remote_path).quote(), data=data)
+
+    def upload_file(self, local_path: Path, remote_path: str | ResolvedPath) -> str:
+        full_remote_path = self._prepare_upload(remote_path)
+
+        # A large read buffer keeps the PUT body to one read() per MiB
+        with open(local_path, "rb", buffering=UPLOAD_CHUNK_SIZE) as f:
+            self._put(full_remote_path, f)
 
-        logger.info(f"Uploaded {local_path.name} to {full_remote_path}")
+        logger.debug("Uploaded %s to %s", local_path.name, full_remote_path)
+        return full_remote_path
+
+    def upload_bytes(self, data: bytes, remote_path: str | ResolvedPath) -> str:
+        """Upload content already held in memory."""
+        full_remote_path = self._prepare_upload(remote_path)
+
+        self._put(full_remote_path, data)
+
+        logger.debug("Uploaded %d bytes to %s", len(data), full_remote_path)
+        return full_remote_path
+
+    def upload_stream(
+        self, chunks: Iterable[bytes], remote_path: str | ResolvedPath, size: int | None = None
+    ) -> str:
+        """Upload from an iterator of chunks; a chunked PUT unless the exact size is given."""
+        full_remote_path = self._prepare_upload(remote_path)
+
+        # Some servers and proxies reject or spool chunked bodies
+        buff = chunks if size is None else _SizedChunks(chunks, size)
+        self._put(full_remote_path, buff)
+
+        logger.debug("Uploaded stream to %s", full_remote_path)
         return full_remote_path
 
     def check_connection(self) -> bool:
@@ -69,25 +211,192 @@ class NextcloudUploader:
             return False
 
 
+class NextcloudAsyncUploader:
+    """WebDAV uploader on a pooled aiohttp session, for use directly from the event loop."""
+
+    def __init__(self, config: NextcloudConfig):
+        self.config = config
+        self.base_path = PurePosixPath(config.base_path)
+        self._base_prefix = str(self.base_path).rstrip("/") + "/"
+        self.webdav_url = (
+            config.url.rstrip("/") + "/remote.php/dav/files/" + quote(config.username)
+        )
+        # Built by hand: aiohttp's BasicAuth is deprecated in recent releases
+        credentials = f"{config.username}:{config.password}".encode()
+        self._authorization = "Basic " + base64.b64encode(credentials).decode("ascii")
+        self._http: aiohttp.ClientSession | None = None
+        self._known_dirs = _KnownDirs()
+        # Per-directory locks so concurrent uploads create each level once
+        self._dir_locks: dict[str, asyncio.Lock] = {}
+
+    def _session(self) -> aiohttp.ClientSession:
+        # Created lazily so it binds to the running event loop
+        if self._http is None or self._http.closed:
+            # Every request goes to the one Nextcloud host
+            self._http = make_session(
+                limit=16,
+                limit_per_host=16,
+                headers={"Authorization": self._authorization},
+                timeout=UPLOAD_TIMEOUT,
+            )
+        return self._http
+
+    def _full_path(self, relative_path: str) -> str:
+        return self._base_prefix + relative_path.lstrip("/")
+
+    def _url(self, full_path: str) -> str:
+        return self.webdav_url + quote(full_path)
+
+    async def _make_collection(self, path: str) -> None:
+        async with self._session().request("MKCOL", self._url(path + "/")) as response:
+            # 405: the collection already exists
+            if response.status != 405:
+                response.raise_for_status()
+                logger.debug(f"Created directory: {path}")
+
+    async def ensure_directory(self, remote_path: str) -> None:
+        full_path = PurePosixPath(self._full_path(remote_path))
+
+        for path in reversed((full_path, *full_path.parents)):
+            key = str(path)
+            if path == PurePosixPath("/") or key in self._known_dirs:
+                continue
+            async with self._dir_locks.setdefault(key, asyncio.Lock()):
+                if key in self._known_dirs:
+                    continue
+                await self._make_collection(key)
+                self._known_dirs.add(key)
+            # Later callers hit _known_dirs first, so the lock is no longer needed
+            self._dir_locks.pop(key, None)
+
+    async def _prepare_upload(self, remote_path: str | ResolvedPath) -> str:
+        resolved = ResolvedPath.of(remote_path)
+        if resolved.parent:
+            await self.ensure_directory(resolved.parent)
+
+        return self._full_path(resolved.full)
+
+    async def _put(
+        self, full_remote_path: str, data: object, headers: dict[str, str] | None = None
+    ) -> None:
+        async with self._session().put(
+            self._url(full_remote_path), data=data, headers=headers
+        ) as response:
+            response.raise_for_status()
+
+    async def upload_file(self, local_path: Path, remote_path: str | ResolvedPath) -> str:
+        full_remote_path = await self._prepare_upload(remote_path)
+
+        size = (await asyncio.to_thread(local_path.stat)).st_size
+
+        async def chunks() -> AsyncIterator[bytes]:
+            async with aiofiles.open(local_path, "rb") as f:
+                while chunk := await f.read(UPLOAD_CHUNK_SIZE):
+                    yield chunk
+
+        # Stream from disk so memory stays bounded; the explicit length keeps
+        # it a plain (non-chunked) PUT
+        await self._put(full_remote_path, chunks(), headers={"Content-Length": str(size)})
+
+        logger.debug("Uploaded %s to %s", local_path.name, full_remote_path)
+        return full_remote_path
+
+    async def upload_bytes(self, data: bytes, remote_path: str | ResolvedPath) -> str:
+        """Upload content already held in memory."""
+        full_remote_path = await self._prepare_upload(remote_path)
+
+        await self._put(full_remote_path, data)
+
+        logger.debug("Uploaded %d bytes to %s", len(data), full_remote_path)
+        return full_remote_path
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        remote_path: str | ResolvedPath,
+        size: int | None = None,
+    ) -> str:
+        """Upload from an async iterator of chunks; a chunked PUT unless the exact size is given."""
+        full_remote_path = await self._prepare_upload(remote_path)
+
+        if size is None:
+            await self._put(full_remote_path, chunks)
+        else:
+            await self._put(
+                full_remote_path,
+                _checked_chunks(chunks, size),
+                headers={"Content-Length": str(size)},
+            )
+
+        logger.debug("Uploaded stream to %s", full_remote_path)
+        return full_remote_path
+
+    async def check_connection(self) -> bool:
+        try:
+            async with self._session().request(
+                "PROPFIND", self._url(str(self.base_path)), headers={"Depth": "0"}
+            ) as response:
+                return response.status < 400
+        except aiohttp.ClientError:
+            return False
+
+    async def close(self) -> None:
+        if self._http:
+            await self._http.close()
+            self._http = None
+
+
 class DryRunUploader:
-    """Uploader that logs operations without actually uploading."""
+    """Uploader that logs operations without actually uploading.
+
+    Async like NextcloudAsyncUploader, so callers treat the two the same way.
+    """
 
     def __init__(self, config: NextcloudConfig):
         self.config = config
         self.base_path = PurePosixPath(config.base_path)
+        self._base_prefix = str(self.base_path).rstrip("/") + "/"
 
     def _full_path(self, relative_path: str) -> str:
-        return str(self.base_path / relative_path)
-
-    def upload_file(self, local_path: Path, remote_path: str) -> str:
-        full_remote_path = self._full_path(remote_path)
-        file_size = local_path.stat().st_size if local_path.exists() else 0
-        logger.info(
-            f"[DRY-RUN] Would upload {local_path.name} ({file_size} bytes) "
-            f"to {full_remote_path}"
-        )
+        return self._base_prefix + relative_path.lstrip("/")
+
+    async def upload_file(self, local_path: Path, remote_path: str | ResolvedPath) -> str:
+        full_remote_path = self._full_path(ResolvedPath.of(remote_path).full)
+        # The size is only for the log line; skip the stat when nobody sees it
+        if logger.isEnabledFor(logging.INFO):
+            file_size = local_path.stat().st_size if local_path.exists() else 0
+            logger.info(
+                "[DRY-RUN] Would upload %s (%d bytes) to %s",
+                local_path.name,
+                file_size,
+                full_remote_path,
+            )
         return full_remote_path
 
-    def check_connection(self) -> bool:
-        logger.info(f"[DRY-RUN] Would connect to {self.config.url}")
+    async def upload_bytes(self, data: bytes, remote_path: str | ResolvedPath) -> str:
+        full_remote_path = self._full_path(ResolvedPath.of(remote_path).full)
+        logger.info("[DRY-RUN] Would upload %d bytes to %s", len(data), full_remote_path)
+        return full_remote_path
+
+    async def upload_stream(
+        self,
+        chunks: AsyncIterable[bytes],
+        remote_path: str | ResolvedPath,
+        size: int | None = None,
+    ) -> str:
+        full_remote_path = self._full_path(ResolvedPath.of(remote_path).full)
+        # The stream is never started, so a dry run downloads nothing
+        if size is None:
+            logger.info("[DRY-RUN] Would upload stream to %s", full_remote_path)
+        else:
+            logger.info(
+                "[DRY-RUN] Would upload stream (%d bytes) to %s", size, full_remote_path
+            )
+        return full_remote_path
+
+    async def check_connection(self) -> bool:
+        logger.info("[DRY-RUN] Would connect to %s", self.config.url)
         return True
+
+    async def close(self) -> None:
+        pass
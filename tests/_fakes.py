@@ -0,0 +1,62 @@
+"""Plain stand-ins for python-telegram-bot objects, cheaper than MagicMock trees."""
+
+from dataclasses import dataclass
+from datetime import datetime
+
+
+@dataclass(slots=True)
+class FakeChat:
+    id: int
+    title: str | None = None
+    username: str | None = None
+
+
+@dataclass(slots=True)
+class FakeUser:
+    id: int
+    full_name: str
+    username: str | None = None
+
+
+@dataclass(slots=True)
+class FakeDocument:
+    file_id: str
+    file_name: str | None = None
+    mime_type: str | None = None
+    file_size: int | None = None
+
+
+@dataclass(slots=True)
+class FakePhotoSize:
+    file_id: str
+    file_size: int | None = None
+
+
+@dataclass(slots=True)
+class FakeMessage:
+    message_id: int
+    chat: FakeChat
+    from_user: FakeUser | None
+    date: datetime | None
+    document: FakeDocument | None = None
+    photo: list[FakePhotoSize] | None = None
+    video: FakeDocument | None = None
+    audio: FakeDocument | None = None
+    voice: FakeDocument | None = None
+    video_note: FakeDocument | None = None
+
+
+@dataclass(slots=True)
+class FakeUpdate:
+    message: FakeMessage | None
+
+
+@dataclass(slots=True)
+class FakeTelegramFile:
+    file_path: str | None
+
+
+@dataclass(slots=True)
+class FakeFileMessage:
+    download_url: str
+    filename: str
@@ -0,0 +1,9 @@
+import mimetypes
+
+import pytest
+
+
+@pytest.fixture(autouse=True, scope="session")
+def _prime_mimetypes() -> None:
+    # Load the system MIME tables once, up front, rather than inside whichever test runs first
+    mimetypes.init()
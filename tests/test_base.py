@@ -0,0 +1,44 @@
+import asyncio
+
+import pytest
+
+from src.adapters.base import AsyncDeque
+
+
+class TestAsyncDeque:
+    async def test_fifo_order(self) -> None:
+        queue: AsyncDeque[int] = AsyncDeque()
+        for i in range(3):
+            queue.put_nowait(i)
+
+        assert [await queue.get() for _ in range(3)] == [0, 1, 2]
+        assert queue.empty()
+
+    async def test_get_waits_for_put(self) -> None:
+        queue: AsyncDeque[str] = AsyncDeque()
+
+        getter = asyncio.create_task(queue.get())
+        await asyncio.sleep(0)
+        assert not getter.done()
+
+        queue.put_nowait("item")
+        assert await asyncio.wait_for(getter, timeout=1.0) == "item"
+
+    async def test_put_waits_when_full(self) -> None:
+        queue: AsyncDeque[str] = AsyncDeque(maxsize=1)
+        queue.put_nowait("first")
+
+        with pytest.raises(asyncio.QueueFull):
+            queue.put_nowait("second")
+
+        putter = asyncio.create_task(queue.put("second"))
+        await asyncio.sleep(0)
+        assert not putter.done()
+
+        assert queue.get_nowait() == "first"
+        await asyncio.wait_for(putter, timeout=1.0)
+        assert queue.get_nowait() == "second"
+
+    def test_get_nowait_raises_when_empty(self) -> None:
+        with pytest.raises(asyncio.QueueEmpty):
+            AsyncDeque().get_nowait()
@@ -4,9 +4,15 @@ from pathlib import Path
 import pytest
 import yaml
 
+from src import config as config_module
 from src.config import Config, MatrixConfig, NextcloudConfig
 
 
+@pytest.fixture(autouse=True)
+def isolated_cache(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setattr(config_module, "_CONFIG_CACHE", {})
+
+
 class TestConfig:
     def test_load_valid_config(self, tmp_path: Path) -> None:
         config_data = {
@@ -68,6 +74,8 @@ class TestConfig:
 
         assert config.nextcloud.base_path == "/ChatUploads"
         assert config.path_template == "{platform}/{room}/{filename}"
+        assert config.download_concurrency == 4
+        assert config.queue_size == 32
 
     def test_load_config_matrix_disabled(self, tmp_path: Path) -> None:
         config_data = {
@@ -129,3 +137,27 @@ class TestConfig:
 
         with pytest.raises(KeyError):
             Config.load(config_file)
+
+    def test_load_config_is_cached_until_file_changes(self, tmp_path: Path) -> None:
+        config_data = {
+            "nextcloud": {
+                "url": "https://nextcloud.example.com",
+                "username": "testuser",
+                "password": "testpass",
+            },
+        }
+
+        config_file = tmp_path / "config.yaml"
+        with open(config_file, "w") as f:
+            yaml.dump(config_data, f)
+
+        first = Config.load(config_file)
+        assert Config.load(config_file) is first
+
+        config_data["nextcloud"]["base_path"] = "/Changed"
+        with open(config_file, "w") as f:
+            yaml.dump(config_data, f)
+
+        reloaded = Config.load(config_file)
+        assert reloaded is not first
+        assert reloaded.nextcloud.base_path == "/Changed"
@@ -1,4 +1,5 @@
-from datetime import datetime, timezone
+import asyncio
+from dataclasses import replace
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -6,6 +7,9 @@ import pytest
 
 from src.adapters.base import FileMessage
 from src.file_processor import FileProcessor
+from src.config import NextcloudConfig
+from src.path_resolver import ResolvedPath, _resolve_cached
+from src.uploader import DryRunUploader
 
 
 @pytest.fixture
@@ -19,7 +23,7 @@ def file_message() -> FileMessage:
         filename="photo.jpg",
         mimetype="image/jpeg",
         size=12345,
-        timestamp=datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc),
+        timestamp_ms=1718452800000,  # 2024-06-15 12:00:00 UTC
         download_url="mxc://example.com/abc123",
         message_id="$event123",
     )
@@ -36,6 +40,8 @@ def mock_uploader() -> MagicMock:
 def mock_adapter() -> AsyncMock:
     adapter = AsyncMock()
     adapter.platform_name = "matrix"
+    adapter.supports_streaming = False
+    adapter.exact_sizes = False
 
     async def mock_download(file_message: FileMessage, destination: Path) -> Path:
         destination.write_bytes(b"fake image data")
@@ -45,6 +51,22 @@ def mock_adapter() -> AsyncMock:
     return adapter
 
 
+@pytest.fixture
+def streaming_adapter() -> MagicMock:
+    adapter = MagicMock()
+    adapter.platform_name = "matrix"
+    adapter.supports_streaming = True
+    # Matrix sizes are declared by the sender
+    adapter.exact_sizes = False
+
+    async def mock_stream(file_message: FileMessage):
+        for chunk in (b"fake ", b"image ", b"data"):
+            yield chunk
+
+    adapter.download_stream.side_effect = mock_stream
+    return adapter
+
+
 class TestFileProcessor:
     async def test_process_file_success(
         self,
@@ -64,7 +86,21 @@ class TestFileProcessor:
         mock_uploader.upload_file.assert_called_once()
 
         call_args = mock_uploader.upload_file.call_args
-        assert call_args[0][1] == "matrix/Test Room/2024-06-15/photo.jpg"
+        assert call_args[0][1].full == "matrix/Test Room/2024-06-15/photo.jpg"
+
+    async def test_process_file_reuses_cached_path(
+        self,
+        mock_uploader: MagicMock,
+        mock_adapter: AsyncMock,
+        file_message: FileMessage,
+    ) -> None:
+        processor = FileProcessor(uploader=mock_uploader, path_template="{room}/{filename}")
+        _resolve_cached.cache_clear()
+
+        await processor.process_file(mock_adapter, file_message)
+        await processor.process_file(mock_adapter, file_message)
+
+        assert _resolve_cached.cache_info().hits == 1
 
     async def test_process_file_uses_correct_path_template(
         self,
@@ -80,7 +116,7 @@ class TestFileProcessor:
         await processor.process_file(mock_adapter, file_message)
 
         call_args = mock_uploader.upload_file.call_args
-        assert call_args[0][1] == "matrix/Alice/photo.jpg"
+        assert call_args[0][1].full == "matrix/Alice/photo.jpg"
 
     async def test_process_file_download_error(
         self,
@@ -141,3 +177,233 @@ class TestFileProcessor:
 
         assert len(temp_files_created) == 1
         assert not temp_files_created[0].exists()
+
+    async def test_process_file_limits_concurrent_downloads(
+        self,
+        mock_uploader: MagicMock,
+        mock_adapter: AsyncMock,
+        file_message: FileMessage,
+    ) -> None:
+        active = 0
+        peak = 0
+
+        async def slow_download(fm: FileMessage, dest: Path) -> Path:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            dest.write_bytes(b"data")
+            active -= 1
+            return dest
+
+        mock_adapter.download_file.side_effect = slow_download
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+            max_downloads=2,
+        )
+
+        await asyncio.gather(
+            *(processor.process_file(mock_adapter, file_message) for _ in range(5))
+        )
+
+        assert peak == 2
+        assert mock_uploader.upload_file.call_count == 5
+
+    async def test_process_file_uploads_inline_payload(
+        self,
+        mock_uploader: MagicMock,
+        mock_adapter: AsyncMock,
+        file_message: FileMessage,
+    ) -> None:
+        mock_uploader.upload_bytes.return_value = "/TestUploads/signal/photo.jpg"
+        file_message = replace(file_message, platform="signal", payload=b"inline data")
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+        )
+
+        result = await processor.process_file(mock_adapter, file_message)
+
+        assert result == "/TestUploads/signal/photo.jpg"
+        mock_uploader.upload_bytes.assert_called_once_with(
+            b"inline data", ResolvedPath("signal/photo.jpg", "signal", "photo.jpg")
+        )
+        mock_adapter.download_file.assert_not_called()
+        mock_uploader.upload_file.assert_not_called()
+
+    async def test_process_file_streams_without_temp_file(
+        self,
+        mock_uploader: MagicMock,
+        streaming_adapter: MagicMock,
+        file_message: FileMessage,
+    ) -> None:
+        received: list[bytes] = []
+
+        def consume(chunks, remote_path: str, size: int | None = None) -> str:
+            received.extend(chunks)
+            return f"/TestUploads/{remote_path.full}"
+
+        mock_uploader.upload_stream.side_effect = consume
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+        )
+
+        result = await processor.process_file(streaming_adapter, file_message)
+
+        assert result == "/TestUploads/matrix/photo.jpg"
+        assert b"".join(received) == b"fake image data"
+        # The sender-declared size is not trusted as a Content-Length
+        assert mock_uploader.upload_stream.call_args.kwargs["size"] is None
+        streaming_adapter.download_file.assert_not_called()
+        mock_uploader.upload_file.assert_not_called()
+
+    async def test_process_file_dry_run_is_awaited_directly(
+        self, mock_adapter: AsyncMock, file_message: FileMessage
+    ) -> None:
+        uploader = DryRunUploader(
+            NextcloudConfig(url="https://nc.example.com", username="u", password="p")
+        )
+        processor = FileProcessor(uploader=uploader, path_template="{platform}/{filename}")
+
+        with patch("src.file_processor.asyncio.to_thread") as mock_to_thread:
+            result = await processor.process_file(mock_adapter, file_message)
+
+        assert result == "/ChatUploads/matrix/photo.jpg"
+        mock_to_thread.assert_not_called()
+
+    async def test_process_file_passes_server_reported_size(
+        self,
+        mock_uploader: MagicMock,
+        streaming_adapter: MagicMock,
+        file_message: FileMessage,
+    ) -> None:
+        streaming_adapter.exact_sizes = True
+        mock_uploader.upload_stream.return_value = "/TestUploads/matrix/photo.jpg"
+
+        processor = FileProcessor(uploader=mock_uploader, path_template="{platform}/{filename}")
+        await processor.process_file(streaming_adapter, file_message)
+
+        assert mock_uploader.upload_stream.call_args.kwargs["size"] == 12345
+
+    async def test_process_file_async_uploader_awaits_directly(
+        self,
+        mock_adapter: AsyncMock,
+        streaming_adapter: MagicMock,
+        file_message: FileMessage,
+    ) -> None:
+        uploader = AsyncMock()
+        uploader.upload_file.return_value = "/TestUploads/matrix/photo.jpg"
+        received: list[bytes] = []
+
+        async def consume(chunks, remote_path: str, size: int | None = None) -> str:
+            received.extend([chunk async for chunk in chunks])
+            return f"/TestUploads/{remote_path.full}"
+
+        uploader.upload_stream.side_effect = consume
+
+        processor = FileProcessor(uploader=uploader, path_template="{platform}/{filename}")
+
+        with patch("src.file_processor.asyncio.to_thread") as mock_to_thread:
+            assert await processor.process_file(streaming_adapter, file_message) == (
+                "/TestUploads/matrix/photo.jpg"
+            )
+            assert await processor.process_file(mock_adapter, file_message) == (
+                "/TestUploads/matrix/photo.jpg"
+            )
+            mock_to_thread.assert_not_called()
+
+        assert b"".join(received) == b"fake image data"
+        uploader.upload_file.assert_awaited_once()
+
+    async def test_process_file_stream_download_error_aborts_upload(
+        self,
+        mock_uploader: MagicMock,
+        streaming_adapter: MagicMock,
+        file_message: FileMessage,
+    ) -> None:
+        async def failing_stream(fm: FileMessage):
+            yield b"partial"
+            raise Exception("Download failed")
+
+        streaming_adapter.download_stream.side_effect = failing_stream
+        upload_errors: list[Exception] = []
+
+        def consume(chunks, remote_path: str, size: int | None = None) -> str:
+            try:
+                b"".join(chunks)
+            except Exception as e:
+                upload_errors.append(e)
+                raise
+            return remote_path
+
+        mock_uploader.upload_stream.side_effect = consume
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+        )
+
+        result = await processor.process_file(streaming_adapter, file_message)
+
+        assert result is None
+        assert [str(e) for e in upload_errors] == ["Download failed"]
+
+    async def test_process_file_stream_upload_error_stops_download(
+        self,
+        mock_uploader: MagicMock,
+        streaming_adapter: MagicMock,
+        file_message: FileMessage,
+    ) -> None:
+        async def endless_stream(fm: FileMessage):
+            while True:
+                yield b"chunk"
+
+        streaming_adapter.download_stream.side_effect = endless_stream
+        mock_uploader.upload_stream.side_effect = Exception("Upload failed")
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+        )
+
+        result = await asyncio.wait_for(
+            processor.process_file(streaming_adapter, file_message), timeout=1.0
+        )
+
+        assert result is None
+
+    async def test_process_many_limits_concurrency(
+        self,
+        mock_uploader: MagicMock,
+        mock_adapter: AsyncMock,
+        file_message: FileMessage,
+    ) -> None:
+        active = 0
+        peak = 0
+
+        async def slow_download(fm: FileMessage, dest: Path) -> Path:
+            nonlocal active, peak
+            active += 1
+            peak = max(peak, active)
+            await asyncio.sleep(0.01)
+            dest.write_bytes(b"data")
+            active -= 1
+            return dest
+
+        mock_adapter.download_file.side_effect = slow_download
+
+        processor = FileProcessor(
+            uploader=mock_uploader,
+            path_template="{platform}/{filename}",
+            max_concurrency=3,
+        )
+
+        results = await processor.process_many(mock_adapter, [file_message] * 7)
+
+        assert peak == 3
+        assert results == ["/TestUploads/matrix/Test Room/2024-06-15/photo.jpg"] * 7
@@ -0,0 +1,40 @@
+import asyncio
+from collections.abc import AsyncIterator
+from pathlib import Path
+
+from main import run_adapter
+from src.adapters.base import BaseAdapter, FileMessage
+
+
+class _FailingAdapter(BaseAdapter):
+    """Adapter whose connect() and disconnect() both fail, like an unreachable bot API."""
+
+    platform_name = "failing"
+
+    def __init__(self) -> None:
+        self.disconnected = False
+
+    async def connect(self) -> None:
+        raise RuntimeError("connect failed")
+
+    async def disconnect(self) -> None:
+        self.disconnected = True
+        raise RuntimeError("This Updater is not running!")
+
+    async def listen(self) -> AsyncIterator[FileMessage]:
+        return
+        yield
+
+    async def download_file(self, file_message: FileMessage, destination: Path) -> Path:
+        raise NotImplementedError
+
+
+class TestRunAdapter:
+    async def test_failed_connect_and_disconnect_stops_cleanly(self) -> None:
+        adapter = _FailingAdapter()
+        stop_event = asyncio.Event()
+
+        await run_adapter(adapter, asyncio.Queue(), stop_event)
+
+        assert adapter.disconnected
+        assert stop_event.is_set()
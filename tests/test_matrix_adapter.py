@@ -1,5 +1,4 @@
 import asyncio
-from datetime import datetime, timezone
 from pathlib import Path
 from unittest.mock import AsyncMock, MagicMock, patch
 
@@ -19,6 +18,20 @@ def matrix_config() -> MatrixConfig:
     )
 
 
+def _mock_session(versions: list[str] | None = None) -> MagicMock:
+    mock_response = MagicMock()
+    mock_response.raise_for_status = MagicMock()
+    mock_response.json = AsyncMock(return_value={"versions": versions or ["v1.1"]})
+
+    mock_get_cm = AsyncMock()
+    mock_get_cm.__aenter__.return_value = mock_response
+
+    session = MagicMock()
+    session.get.return_value = mock_get_cm
+    session.close = AsyncMock()
+    return session
+
+
 class TestMatrixAdapter:
     def test_init(self, matrix_config: MatrixConfig) -> None:
         with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
@@ -46,11 +59,56 @@ class TestMatrixAdapter:
             mock_client.rooms = {}
 
             adapter = MatrixAdapter(matrix_config)
-            await adapter.connect()
+            with patch("src.adapters.matrix.make_session", return_value=_mock_session()):
+                await adapter.connect()
 
-            assert mock_client.add_event_callback.call_count == 5
+            assert mock_client.add_event_callback.call_count == 7
             mock_client.whoami.assert_called_once()
             assert mock_client.sync.call_count == 1
+            assert adapter._http is not None
+
+            await adapter.disconnect()
+            assert adapter._http is None
+
+    async def test_connect_does_not_block_on_full_queue(
+        self, matrix_config: MatrixConfig
+    ) -> None:
+        with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client_class.return_value = mock_client
+            mock_client.add_event_callback = MagicMock()
+            mock_client.whoami.return_value = MagicMock(user_id="@bot:example.com")
+            mock_client.rooms = {}
+
+            adapter = MatrixAdapter(matrix_config, queue_size=2)
+
+            room = MagicMock()
+            room.room_id = "!test:example.com"
+            room.display_name = "Test Room"
+
+            # nio awaits event callbacks inside sync(), before listen() runs
+            async def initial_sync(**kwargs: object) -> MagicMock:
+                for i in range(3):
+                    event = MagicMock()
+                    event.sender = "@alice:example.com"
+                    event.body = f"file{i}.jpg"
+                    event.server_timestamp = 1718452800000
+                    event.source = {"content": {"url": f"mxc://example.com/{i}"}}
+                    await adapter._on_message(room, event)
+                return MagicMock()
+
+            mock_client.sync.side_effect = initial_sync
+
+            with patch("src.adapters.matrix.make_session", return_value=_mock_session()):
+                async with asyncio.timeout(1.0):
+                    await adapter.connect()
+
+            listener = adapter.listen()
+            with patch.object(adapter, "_sync_forever", AsyncMock()):
+                names = [(await anext(listener)).filename for _ in range(3)]
+            await listener.aclose()
+
+            assert names == ["file0.jpg", "file1.jpg", "file2.jpg"]
 
     async def test_disconnect_closes_client(self, matrix_config: MatrixConfig) -> None:
         with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
@@ -126,16 +184,78 @@ class TestMatrixAdapter:
 
             await adapter._on_message(mock_room, mock_event)
 
-            file_message = await asyncio.wait_for(
-                adapter._file_queue.get(),
-                timeout=1.0,
-            )
+            assert not adapter._file_queue.empty()
+            file_message = adapter._file_queue.get_nowait()
 
             assert file_message.platform == "matrix"
             assert file_message.room_name == "Test Room"
             assert file_message.sender_name == "Alice"
             assert file_message.filename == "photo.jpg"
-            assert file_message.download_url == "mxc://example.com/abc123"
+            assert file_message.download_url == (
+                "https://matrix.example.com/_matrix/media/r0/download/example.com/abc123"
+            )
+
+    async def test_connect_prefers_authenticated_media(
+        self, matrix_config: MatrixConfig
+    ) -> None:
+        with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client_class.return_value = mock_client
+
+            mock_whoami = MagicMock()
+            mock_whoami.user_id = "@bot:example.com"
+            mock_client.whoami.return_value = mock_whoami
+            mock_client.sync.return_value = MagicMock()
+            mock_client.rooms = {}
+
+            adapter = MatrixAdapter(matrix_config)
+            session = _mock_session(["v1.10", "v1.11"])
+            with patch("src.adapters.matrix.make_session", return_value=session):
+                await adapter.connect()
+
+            session.get.assert_called_once_with(
+                "https://matrix.example.com/_matrix/client/versions"
+            )
+            assert adapter._media_url("mxc://example.com/abc123") == (
+                "https://matrix.example.com/_matrix/client/v1/media/download/example.com/abc123"
+            )
+
+    async def test_on_message_caches_names_until_member_change(
+        self, matrix_config: MatrixConfig
+    ) -> None:
+        with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client_class.return_value = mock_client
+
+            adapter = MatrixAdapter(matrix_config)
+
+            mock_room = MagicMock()
+            mock_room.room_id = "!test:example.com"
+            mock_room.display_name = "Test Room"
+            mock_room.user_name.return_value = "Alice"
+
+            mock_event = MagicMock()
+            mock_event.sender = "@alice:example.com"
+            mock_event.body = "photo.jpg"
+            mock_event.server_timestamp = 1718452800000
+            mock_event.source = {"content": {"url": "mxc://example.com/abc123"}}
+
+            await adapter._on_message(mock_room, mock_event)
+            await adapter._on_message(mock_room, mock_event)
+            assert mock_room.user_name.call_count == 1
+
+            mock_member_event = MagicMock()
+            mock_member_event.state_key = "@alice:example.com"
+            await adapter._on_member_change(mock_room, mock_member_event)
+
+            mock_room.user_name.return_value = "Alice Renamed"
+            await adapter._on_message(mock_room, mock_event)
+
+            adapter._file_queue.get_nowait()
+            adapter._file_queue.get_nowait()
+            file_message = adapter._file_queue.get_nowait()
+            assert mock_room.user_name.call_count == 2
+            assert file_message.sender_name == "Alice Renamed"
 
     async def test_on_message_ignores_own_messages(self, matrix_config: MatrixConfig) -> None:
         with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
@@ -182,38 +302,81 @@ class TestMatrixAdapter:
             adapter = MatrixAdapter(matrix_config)
 
             mock_file_message = MagicMock()
-            mock_file_message.download_url = "mxc://example.com/abc123"
+            mock_file_message.download_url = (
+                "https://matrix.example.com/_matrix/media/r0/download/example.com/abc123"
+            )
             mock_file_message.filename = "test.jpg"
 
             destination = tmp_path / "test.jpg"
 
-            with patch("src.adapters.matrix.aiohttp.ClientSession") as mock_session_class:
-                async def mock_iter_chunked(size: int):
-                    yield b"fake image data"
+            async def mock_iter_any():
+                yield b"fake image "
+                yield b"data"
 
-                mock_response = MagicMock()
-                mock_response.raise_for_status = MagicMock()
-                mock_response.content.iter_chunked = mock_iter_chunked
+            mock_response = MagicMock()
+            mock_response.raise_for_status = MagicMock()
+            mock_response.content.iter_any = mock_iter_any
 
-                mock_get_cm = AsyncMock()
-                mock_get_cm.__aenter__.return_value = mock_response
+            mock_get_cm = AsyncMock()
+            mock_get_cm.__aenter__.return_value = mock_response
 
-                mock_session = MagicMock()
-                mock_session.get.return_value = mock_get_cm
+            mock_session = MagicMock()
+            mock_session.get.return_value = mock_get_cm
+            adapter._http = mock_session
 
-                mock_session_cm = AsyncMock()
-                mock_session_cm.__aenter__.return_value = mock_session
-                mock_session_class.return_value = mock_session_cm
+            result = await adapter.download_file(mock_file_message, destination)
+
+            assert result == destination
+            assert destination.exists()
+            assert destination.read_bytes() == b"fake image data"
+
+            mock_session.get.assert_called_once_with(
+                "https://matrix.example.com/_matrix/media/r0/download/example.com/abc123",
+                headers={"Authorization": "Bearer test_access_token"},
+            )
+
+    async def test_download_file_not_connected_raises_error(
+        self, matrix_config: MatrixConfig, tmp_path: Path
+    ) -> None:
+        with patch("src.adapters.matrix.AsyncClient"):
+            adapter = MatrixAdapter(matrix_config)
+
+            mock_file_message = MagicMock()
+            mock_file_message.download_url = "mxc://example.com/abc123"
+            mock_file_message.filename = "test.jpg"
+
+            with pytest.raises(RuntimeError, match="Not connected"):
+                await adapter.download_file(mock_file_message, tmp_path / "test.jpg")
+
+    async def test_sync_forever_backs_off_exponentially(
+        self, matrix_config: MatrixConfig
+    ) -> None:
+        with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
+            mock_client = AsyncMock()
+            mock_client_class.return_value = mock_client
+
+            from nio import SyncError
+
+            mock_client.sync.side_effect = [
+                Exception("down"),
+                SyncError(message="still down"),
+                MagicMock(),
+                Exception("down again"),
+            ]
+
+            adapter = MatrixAdapter(matrix_config)
+            adapter._running = True
+            delays: list[float] = []
 
-                result = await adapter.download_file(mock_file_message, destination)
+            async def fake_sleep(delay: float) -> None:
+                delays.append(delay)
+                if len(delays) == 3:
+                    adapter._running = False
 
-                assert result == destination
-                assert destination.exists()
-                assert destination.read_bytes() == b"fake image data"
+            with patch("src.adapters.matrix.asyncio.sleep", fake_sleep):
+                await adapter._sync_forever()
 
-                mock_session.get.assert_called_once_with(
-                    "https://matrix.example.com/_matrix/media/r0/download/example.com/abc123"
-                )
+            assert delays == [1.0, 2.0, 1.0]
 
     async def test_connect_fails_on_invalid_token(self, matrix_config: MatrixConfig) -> None:
         with patch("src.adapters.matrix.AsyncClient") as mock_client_class:
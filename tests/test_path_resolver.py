@@ -1,8 +1,18 @@
 from datetime import datetime, timezone
+from unittest.mock import patch
 
 import pytest
 
-from src.path_resolver import FileMetadata, resolve_path, sanitize_path_component
+from src import path_resolver
+from src.path_resolver import (
+    FileMetadata,
+    ResolvedPath,
+    _resolve_cached,
+    compile_template,
+    resolve_path,
+    sanitize_path_component,
+    template_placeholders,
+)
 
 
 class TestSanitizePathComponent:
@@ -34,7 +44,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{platform}/{room}/{filename}", metadata)
-        assert result == "matrix/General Chat/photo.jpg"
+        assert result.full == "matrix/General Chat/photo.jpg"
 
     def test_date_variables(self) -> None:
         metadata = FileMetadata(
@@ -46,7 +56,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{year}/{month}/{day}/{filename}", metadata)
-        assert result == "2024/03/15/file.txt"
+        assert result.full == "2024/03/15/file.txt"
 
     def test_date_combined(self) -> None:
         metadata = FileMetadata(
@@ -58,7 +68,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{date}/{filename}", metadata)
-        assert result == "2024-03-15/file.txt"
+        assert result.full == "2024-03-15/file.txt"
 
     def test_sender_variable(self) -> None:
         metadata = FileMetadata(
@@ -69,7 +79,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{platform}/{sender}/{filename}", metadata)
-        assert result == "telegram/Charlie/doc.pdf"
+        assert result.full == "telegram/Charlie/doc.pdf"
 
     def test_filename_base_and_ext(self) -> None:
         metadata = FileMetadata(
@@ -80,7 +90,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{filename_base}.{ext}", metadata)
-        assert result == "document.backup.tar.gz"
+        assert result.full == "document.backup.tar.gz"
 
     def test_filename_without_extension(self) -> None:
         metadata = FileMetadata(
@@ -91,7 +101,18 @@ class TestResolvePath:
         )
 
         result = resolve_path("{filename_base}.{ext}", metadata)
-        assert result == "README."
+        assert result.full == "README."
+
+    def test_dotfile_has_no_extension(self) -> None:
+        metadata = FileMetadata(
+            platform="matrix",
+            room="test",
+            sender="user",
+            filename=".bashrc",
+        )
+
+        result = resolve_path("{filename_base}/ext-{ext}", metadata)
+        assert result.full == "bashrc/ext-"
 
     def test_sanitizes_room_name(self) -> None:
         metadata = FileMetadata(
@@ -102,7 +123,7 @@ class TestResolvePath:
         )
 
         result = resolve_path("{room}/{filename}", metadata)
-        assert result == "Room_ Test_Chat/file.txt"
+        assert result.full == "Room_ Test_Chat/file.txt"
 
     def test_uses_current_time_if_no_timestamp(self) -> None:
         metadata = FileMetadata(
@@ -115,7 +136,30 @@ class TestResolvePath:
 
         result = resolve_path("{year}/{filename}", metadata)
         current_year = datetime.now().strftime("%Y")
-        assert result == f"{current_year}/file.txt"
+        assert result.full == f"{current_year}/file.txt"
+
+    def test_current_time_fallback_is_reused_within_a_second(
+        self, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr(path_resolver, "_now_cache", (float("-inf"), datetime.min))
+        calls = 0
+        real_datetime = datetime
+
+        class CountingDatetime(datetime):
+            @classmethod
+            def now(cls, tz=None):
+                nonlocal calls
+                calls += 1
+                return real_datetime.now(tz)
+
+        monkeypatch.setattr(path_resolver, "datetime", CountingDatetime)
+        render = compile_template("{date}/{filename}")
+        metadata = FileMetadata(platform="matrix", room="r", sender="s", filename="f.txt")
+
+        render(metadata)
+        render(metadata)
+
+        assert calls == 1
 
     def test_complex_template(self) -> None:
         metadata = FileMetadata(
@@ -130,4 +174,124 @@ class TestResolvePath:
             "{platform}/{room}/{year}/{month}/{sender}_{filename}",
             metadata,
         )
-        assert result == "matrix/Family Photos/2024/07/Mom_vacation.jpg"
+        assert result.full == "matrix/Family Photos/2024/07/Mom_vacation.jpg"
+
+    def test_unknown_placeholder_is_kept(self) -> None:
+        metadata = FileMetadata(
+            platform="matrix",
+            room="test",
+            sender="user",
+            filename="file.txt",
+        )
+
+        result = resolve_path("{platform}/{unknown}/{filename}", metadata)
+        assert result.full == "matrix/{unknown}/file.txt"
+
+    def test_placeholders_in_values_are_not_expanded(self) -> None:
+        metadata = FileMetadata(
+            platform="matrix",
+            room="test",
+            sender="user",
+            filename="{ext}.txt",
+        )
+
+        result = resolve_path("{room}/{filename}", metadata)
+        assert result.full == "test/{ext}.txt"
+
+    def test_hour_and_minute_variables(self) -> None:
+        metadata = FileMetadata(
+            platform="matrix",
+            room="test",
+            sender="user",
+            filename="file.txt",
+            timestamp=datetime(2024, 3, 5, 9, 7, 0, tzinfo=timezone.utc),
+        )
+
+        result = resolve_path("{date}/{hour}-{minute}/{filename}", metadata)
+        assert result.full == "2024-03-05/09-07/file.txt"
+
+    def test_returns_split_path(self) -> None:
+        metadata = FileMetadata(
+            platform="matrix",
+            room="General",
+            sender="user",
+            filename="photo.jpg",
+        )
+
+        result = resolve_path("{platform}/{room}/{filename}", metadata)
+        assert result == ResolvedPath("matrix/General/photo.jpg", "matrix/General", "photo.jpg")
+
+        assert resolve_path("{filename}", metadata) == ResolvedPath("photo.jpg", "", "photo.jpg")
+
+    def test_same_minute_is_cached(self) -> None:
+        _resolve_cached.cache_clear()
+
+        for second in (5, 40):
+            metadata = FileMetadata(
+                platform="matrix",
+                room="test",
+                sender="user",
+                filename="file.txt",
+                timestamp=datetime(2024, 3, 5, 9, 7, second, tzinfo=timezone.utc),
+            )
+            assert resolve_path("{date}/{filename}", metadata).full == "2024-03-05/file.txt"
+
+        assert _resolve_cached.cache_info().hits == 1
+
+
+class TestCompileTemplate:
+    def test_matches_resolve_path(self) -> None:
+        template = "{platform}/{room}/{year}/{month}/{filename_base}.{ext}"
+        metadata = FileMetadata(
+            platform="matrix",
+            room="My: Room",
+            sender="user",
+            filename="photo.final.jpg",
+            timestamp=datetime(2024, 7, 4, 14, 30, 0, tzinfo=timezone.utc),
+        )
+
+        render = compile_template(template)
+
+        assert render(metadata) == resolve_path(template, metadata)
+        assert render(metadata).full == "matrix/My_ Room/2024/07/photo.final.jpg"
+
+    def test_keeps_literals_and_unknown_placeholders(self) -> None:
+        metadata = FileMetadata(platform="signal", room="r", sender="s", filename="f.txt")
+
+        render = compile_template("/uploads/{unknown}/{platform}-{filename}")
+
+        assert render(metadata).full == "/uploads/{unknown}/signal-f.txt"
+
+    def test_without_date_placeholders_skips_clock(self) -> None:
+        metadata = FileMetadata(platform="signal", room="r", sender="s", filename="f.txt")
+
+        render = compile_template("{platform}/{room}/{filename}")
+
+        with patch("src.path_resolver.datetime") as mock_datetime:
+            assert render(metadata).full == "signal/r/f.txt"
+            mock_datetime.now.assert_not_called()
+
+
+class TestTemplatePlaceholders:
+    def test_collects_placeholder_names(self) -> None:
+        assert template_placeholders("{platform}/{room}/{platform}-{ext}") == {
+            "platform",
+            "room",
+            "ext",
+        }
+
+    def test_resolve_path_without_date_skips_clock(self) -> None:
+        metadata = FileMetadata(platform="signal", room="r", sender="s", filename="f.txt")
+
+        with patch("src.path_resolver.datetime") as mock_datetime:
+            assert resolve_path("{platform}/{room}/{filename}", metadata).full == "signal/r/f.txt"
+            mock_datetime.now.assert_not_called()
+
+    def test_unused_fields_share_cache_entry(self) -> None:
+        _resolve_cached.cache_clear()
+
+        for sender in ("alice", "bob"):
+            metadata = FileMetadata(platform="signal", room="r", sender=sender, filename="f.txt")
+            assert resolve_path("{room}/{filename}", metadata).full == "r/f.txt"
+
+        assert _resolve_cached.cache_info().hits == 1
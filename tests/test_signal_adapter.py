@@ -1,8 +1,8 @@
 import asyncio
-import base64
+import binascii
 from datetime import datetime, timezone
 from pathlib import Path
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import MagicMock
 
 import pytest
 
@@ -10,7 +10,26 @@ from src.adapters.signal import FileCollectorCommand, SignalAdapter
 from src.config import SignalConfig
 
 
-@pytest.fixture
+def _b64(data: bytes) -> str:
+    return binascii.b2a_base64(data, newline=False).decode("ascii")
+
+
+class _FakeBot:
+    """Stand-in for SignalBot that records what the adapter does with it."""
+
+    def __init__(self, config: dict[str, str]) -> None:
+        self.config = config
+        self.registered: list[object] = []
+        self.started = False
+
+    def register(self, command: object) -> None:
+        self.registered.append(command)
+
+    def start(self) -> None:
+        self.started = True
+
+
+@pytest.fixture(scope="module")
 def signal_config() -> SignalConfig:
     return SignalConfig(
         enabled=True,
@@ -19,6 +38,12 @@ def signal_config() -> SignalConfig:
     )
 
 
+@pytest.fixture(scope="module")
+def signal_adapter(signal_config: SignalConfig) -> SignalAdapter:
+    # Shared by tests that only call download_file, which keeps no adapter state
+    return SignalAdapter(signal_config)
+
+
 class TestSignalAdapter:
     def test_init(self, signal_config: SignalConfig) -> None:
         adapter = SignalAdapter(signal_config)
@@ -27,24 +52,25 @@ class TestSignalAdapter:
         assert adapter.config == signal_config
         assert adapter.bot is None
 
-    async def test_connect_creates_bot(self, signal_config: SignalConfig) -> None:
-        with patch("src.adapters.signal.SignalBot") as mock_bot_class:
-            mock_bot = MagicMock()
-            mock_bot.start = MagicMock()
-            mock_bot_class.return_value = mock_bot
-
-            adapter = SignalAdapter(signal_config)
+    async def test_connect_creates_bot(
+        self, signal_config: SignalConfig, monkeypatch: pytest.MonkeyPatch
+    ) -> None:
+        monkeypatch.setattr("src.adapters.signal.SignalBot", _FakeBot)
 
-            # Mock the _run_bot to not actually run
-            with patch.object(adapter, "_run_bot", new_callable=AsyncMock):
-                await adapter.connect()
+        adapter = SignalAdapter(signal_config)
+        await adapter.connect()
+        await asyncio.wait_for(adapter._bot_task, timeout=1.0)
+
+        assert isinstance(adapter.bot, _FakeBot)
+        assert adapter.bot.config == {
+            "signal_service": "127.0.0.1:8080",
+            "phone_number": "+33612345678",
+        }
+        assert len(adapter.bot.registered) == 1
+        assert isinstance(adapter.bot.registered[0], FileCollectorCommand)
+        assert adapter.bot.started
 
-            mock_bot_class.assert_called_once_with({
-                "signal_service": "127.0.0.1:8080",
-                "phone_number": "+33612345678",
-            })
-            mock_bot.register.assert_called_once()
-            assert adapter.bot is not None
+        await adapter.disconnect()
 
     async def test_disconnect_cancels_task(self, signal_config: SignalConfig) -> None:
         adapter = SignalAdapter(signal_config)
@@ -58,6 +84,7 @@ class TestSignalAdapter:
         await adapter.disconnect()
 
         assert adapter._bot_task.cancelled()
+        assert adapter._executor._shutdown
 
 
 class TestFileCollectorCommand:
@@ -75,149 +102,179 @@ class TestFileCollectorCommand:
 
         assert file_queue.empty()
 
-    async def test_handle_message_with_attachment(self) -> None:
+    @pytest.mark.parametrize(
+        ("group", "filename", "room_id", "room_name", "mimetype"),
+        [
+            ("group-456", "photo.jpg", "group-456", "group_group-456", "image/jpeg"),
+            # Private message
+            (None, "document.pdf", "+33611111111", "+33611111111", "application/pdf"),
+        ],
+    )
+    async def test_handle_message_with_attachment(
+        self,
+        group: str | None,
+        filename: str,
+        room_id: str,
+        room_name: str,
+        mimetype: str,
+    ) -> None:
         file_queue: asyncio.Queue = asyncio.Queue()
         command = FileCollectorCommand(file_queue)
 
         # Create test data
         test_content = b"test file content"
-        b64_content = base64.b64encode(test_content).decode("utf-8")
+        b64_content = _b64(test_content)
 
         mock_context = MagicMock()
         mock_context.message.source = "+33611111111"
         mock_context.message.source_uuid = "uuid-123"
-        mock_context.message.group = "group-456"
+        mock_context.message.group = group
         mock_context.message.text = ""
-        mock_context.message.timestamp = 1718457600000  # 2024-06-15 12:00:00 UTC
+        mock_context.message.timestamp = 1718457600000  # 2024-06-15 13:20:00 UTC
         mock_context.message.base64_attachments = [b64_content]
-        mock_context.message.attachments_local_filenames = ["photo.jpg"]
+        mock_context.message.attachments_local_filenames = [filename]
 
         await command.handle(mock_context)
 
-        file_message = await asyncio.wait_for(
-            file_queue.get(),
-            timeout=1.0,
-        )
+        assert not file_queue.empty()
+        file_message = file_queue.get_nowait()
 
         assert file_message.platform == "signal"
-        assert file_message.room_id == "group-456"
-        assert file_message.room_name == "group_group-456"
+        assert file_message.room_id == room_id
+        assert file_message.room_name == room_name
         assert file_message.sender_id == "uuid-123"
         assert file_message.sender_name == "+33611111111"
-        assert file_message.filename == "photo.jpg"
-        assert file_message.mimetype == "image/jpeg"
+        assert file_message.filename == filename
+        assert file_message.mimetype == mimetype
         assert file_message.size == len(test_content)
+        assert file_message.payload == test_content
+        assert file_message.timestamp_ms == 1718457600000
+        assert file_message.timestamp == datetime(2024, 6, 15, 13, 20, tzinfo=timezone.utc)
 
-    async def test_handle_private_message_with_attachment(self) -> None:
+    async def test_handle_multiple_attachments(self) -> None:
         file_queue: asyncio.Queue = asyncio.Queue()
         command = FileCollectorCommand(file_queue)
 
-        test_content = b"private file"
-        b64_content = base64.b64encode(test_content).decode("utf-8")
+        content1 = b"file 1"
+        content2 = b"file 2"
 
         mock_context = MagicMock()
         mock_context.message.source = "+33611111111"
         mock_context.message.source_uuid = "uuid-123"
-        mock_context.message.group = None  # Private message
+        mock_context.message.group = "group-789"
         mock_context.message.text = ""
         mock_context.message.timestamp = 1718457600000
-        mock_context.message.base64_attachments = [b64_content]
-        mock_context.message.attachments_local_filenames = ["document.pdf"]
+        mock_context.message.base64_attachments = [
+            _b64(content1),
+            _b64(content2),
+        ]
+        mock_context.message.attachments_local_filenames = ["file1.png", "file2.mp4"]
 
         await command.handle(mock_context)
 
-        file_message = await asyncio.wait_for(
-            file_queue.get(),
-            timeout=1.0,
-        )
+        # Should have 2 file messages
+        assert file_queue.qsize() == 2
+        file1 = file_queue.get_nowait()
+        file2 = file_queue.get_nowait()
 
-        assert file_message.platform == "signal"
-        assert file_message.room_id == "+33611111111"
-        assert file_message.room_name == "+33611111111"
-        assert file_message.mimetype == "application/pdf"
+        assert file1.filename == "file1.png"
+        assert file1.mimetype == "image/png"
+        assert file2.filename == "file2.mp4"
+        assert file2.mimetype == "video/mp4"
 
-    async def test_handle_multiple_attachments(self) -> None:
-        file_queue: asyncio.Queue = asyncio.Queue()
-        command = FileCollectorCommand(file_queue)
+    async def test_handle_waits_when_queue_full(self, monkeypatch: pytest.MonkeyPatch) -> None:
+        # Decode inline so the handler's progress doesn't depend on thread timing
+        async def run_inline(func, *args):
+            return func(*args)
 
-        content1 = b"file 1"
-        content2 = b"file 2"
+        monkeypatch.setattr("src.adapters.signal.asyncio.to_thread", run_inline)
+        file_queue: asyncio.Queue = asyncio.Queue(maxsize=1)
+        command = FileCollectorCommand(file_queue)
 
         mock_context = MagicMock()
         mock_context.message.source = "+33611111111"
         mock_context.message.source_uuid = "uuid-123"
-        mock_context.message.group = "group-789"
+        mock_context.message.group = None
         mock_context.message.text = ""
         mock_context.message.timestamp = 1718457600000
         mock_context.message.base64_attachments = [
-            base64.b64encode(content1).decode("utf-8"),
-            base64.b64encode(content2).decode("utf-8"),
+            _b64(b"first"),
+            _b64(b"second"),
         ]
-        mock_context.message.attachments_local_filenames = ["file1.png", "file2.mp4"]
+        mock_context.message.attachments_local_filenames = ["a.txt", "b.txt"]
 
-        await command.handle(mock_context)
+        handler = asyncio.create_task(command.handle(mock_context))
+        await asyncio.sleep(0)
 
-        # Should have 2 file messages
-        file1 = await asyncio.wait_for(file_queue.get(), timeout=1.0)
-        file2 = await asyncio.wait_for(file_queue.get(), timeout=1.0)
+        # The second attachment is held back until the consumer catches up
+        assert not handler.done()
+        assert file_queue.get_nowait().filename == "a.txt"
 
-        assert file1.filename == "file1.png"
-        assert file1.mimetype == "image/png"
-        assert file2.filename == "file2.mp4"
-        assert file2.mimetype == "video/mp4"
+        await asyncio.wait_for(handler, timeout=1.0)
+        assert file_queue.get_nowait().filename == "b.txt"
+
+    async def test_handle_keeps_undecodable_attachment_for_download(self) -> None:
+        file_queue: asyncio.Queue = asyncio.Queue()
+        command = FileCollectorCommand(file_queue)
+
+        mock_context = MagicMock()
+        mock_context.message.source = "+33611111111"
+        mock_context.message.source_uuid = "uuid-123"
+        mock_context.message.group = None
+        mock_context.message.text = ""
+        mock_context.message.timestamp = 1718457600000
+        mock_context.message.base64_attachments = ["not-valid-base64!!!"]
+        mock_context.message.attachments_local_filenames = ["bad.txt"]
+
+        await command.handle(mock_context)
+
+        file_message = file_queue.get_nowait()
+        assert file_message.payload is None
+        assert file_message.size == 0
+        assert file_message.download_url == "not-valid-base64!!!"
 
 
 class TestSignalAdapterDownload:
     async def test_download_file(
-        self, signal_config: SignalConfig, tmp_path: Path
+        self, signal_adapter: SignalAdapter, tmp_path: Path
     ) -> None:
-        adapter = SignalAdapter(signal_config)
-
-        test_content = b"test file data for download"
-        b64_content = base64.b64encode(test_content).decode("utf-8")
-
         mock_file_message = MagicMock()
-        mock_file_message.download_url = b64_content
+        mock_file_message.payload = b"test file data for download"
+        mock_file_message.download_url = ""
         mock_file_message.filename = "test.txt"
 
         destination = tmp_path / "test.txt"
 
-        result = await adapter.download_file(mock_file_message, destination)
+        result = await signal_adapter.download_file(mock_file_message, destination)
 
         assert result == destination
-        assert destination.exists()
-        assert destination.read_bytes() == test_content
+        assert destination.read_bytes() == b"test file data for download"
 
     async def test_download_file_creates_parent_dirs(
-        self, signal_config: SignalConfig, tmp_path: Path
+        self, signal_adapter: SignalAdapter, tmp_path: Path
     ) -> None:
-        adapter = SignalAdapter(signal_config)
-
-        test_content = b"nested file"
-        b64_content = base64.b64encode(test_content).decode("utf-8")
-
         mock_file_message = MagicMock()
-        mock_file_message.download_url = b64_content
+        mock_file_message.payload = b"nested file"
+        mock_file_message.download_url = ""
         mock_file_message.filename = "nested.txt"
 
         destination = tmp_path / "a" / "b" / "c" / "nested.txt"
 
-        result = await adapter.download_file(mock_file_message, destination)
+        result = await signal_adapter.download_file(mock_file_message, destination)
 
         assert result == destination
-        assert destination.exists()
-        assert destination.read_bytes() == test_content
+        assert destination.read_bytes() == b"nested file"
 
     async def test_download_file_invalid_base64_raises_error(
-        self, signal_config: SignalConfig, tmp_path: Path
+        self, signal_adapter: SignalAdapter, tmp_path: Path
     ) -> None:
-        adapter = SignalAdapter(signal_config)
-
         mock_file_message = MagicMock()
+        mock_file_message.payload = None
         mock_file_message.download_url = "not-valid-base64!!!"
         mock_file_message.filename = "bad.txt"
 
         destination = tmp_path / "bad.txt"
 
         with pytest.raises(RuntimeError, match="Failed to decode"):
-            await adapter.download_file(mock_file_message, destination)
+            await signal_adapter.download_file(mock_file_message, destination)
+        assert not destination.exists()
@@ -1,13 +1,25 @@
 import asyncio
 from datetime import datetime, timezone
 from pathlib import Path
-from unittest.mock import AsyncMock, MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, PropertyMock, patch
 
+import aiohttp
 import pytest
 
 from src.adapters.telegram import TelegramAdapter
 from src.config import TelegramConfig
 
+from ._fakes import (
+    FakeChat,
+    FakeDocument,
+    FakeFileMessage,
+    FakeMessage,
+    FakePhotoSize,
+    FakeTelegramFile,
+    FakeUpdate,
+    FakeUser,
+)
+
 
 @pytest.fixture
 def telegram_config() -> TelegramConfig:
@@ -24,6 +36,7 @@ class TestTelegramAdapter:
         assert adapter.platform_name == "telegram"
         assert adapter.config == telegram_config
         assert adapter.application is None
+        assert adapter._file_queue.maxsize == 32
 
     async def test_connect_starts_polling(self, telegram_config: TelegramConfig) -> None:
         with patch("src.adapters.telegram.Application") as mock_app_class:
@@ -44,6 +57,10 @@ class TestTelegramAdapter:
             mock_app.initialize.assert_called_once()
             mock_app.start.assert_called_once()
             mock_app.updater.start_polling.assert_called_once()
+            assert adapter._http is not None
+
+            await adapter.disconnect()
+            assert adapter._http is None
 
     async def test_disconnect_stops_application(self, telegram_config: TelegramConfig) -> None:
         with patch("src.adapters.telegram.Application"):
@@ -56,44 +73,47 @@ class TestTelegramAdapter:
             adapter.application.stop.assert_called_once()
             adapter.application.shutdown.assert_called_once()
 
-    async def test_on_file_message_queues_document(self, telegram_config: TelegramConfig) -> None:
-        adapter = TelegramAdapter(telegram_config)
-
-        mock_update = MagicMock()
-        mock_message = MagicMock()
-        mock_update.message = mock_message
-
-        mock_message.chat.id = 12345
-        mock_message.chat.title = "Test Group"
-        mock_message.chat.username = None
+    async def test_disconnect_after_failed_connect(self, telegram_config: TelegramConfig) -> None:
+        with patch("src.adapters.telegram.Application") as mock_app_class:
+            mock_app = AsyncMock()
+            mock_app.running = False
+            mock_app.updater.running = False
+            mock_app.add_handler = MagicMock()
+            mock_app.initialize.side_effect = RuntimeError("Unauthorized")
+            mock_app_class.builder.return_value.token.return_value.build.return_value = mock_app
 
-        mock_message.from_user.id = 67890
-        mock_message.from_user.full_name = "John Doe"
-        mock_message.from_user.username = "johndoe"
+            adapter = TelegramAdapter(telegram_config)
+            with pytest.raises(RuntimeError, match="Unauthorized"):
+                await adapter.connect()
 
-        mock_message.message_id = 100
-        mock_message.date = datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc)
+            await adapter.disconnect()
 
-        mock_message.document = MagicMock()
-        mock_message.document.file_id = "file_123"
-        mock_message.document.file_name = "document.pdf"
-        mock_message.document.mime_type = "application/pdf"
-        mock_message.document.file_size = 12345
+            mock_app.updater.stop.assert_not_called()
+            mock_app.stop.assert_not_called()
+            mock_app.shutdown.assert_called_once()
 
-        mock_message.photo = None
-        mock_message.video = None
-        mock_message.audio = None
-        mock_message.voice = None
-        mock_message.video_note = None
+    async def test_on_file_message_queues_document(self, telegram_config: TelegramConfig) -> None:
+        adapter = TelegramAdapter(telegram_config)
 
-        mock_context = MagicMock()
+        update = FakeUpdate(
+            message=FakeMessage(
+                message_id=100,
+                chat=FakeChat(id=12345, title="Test Group"),
+                from_user=FakeUser(id=67890, full_name="John Doe", username="johndoe"),
+                date=datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc),
+                document=FakeDocument(
+                    file_id="file_123",
+                    file_name="document.pdf",
+                    mime_type="application/pdf",
+                    file_size=12345,
+                ),
+            )
+        )
 
-        await adapter._on_file_message(mock_update, mock_context)
+        await adapter._on_file_message(update, MagicMock())
 
-        file_message = await asyncio.wait_for(
-            adapter._file_queue.get(),
-            timeout=1.0,
-        )
+        assert not adapter._file_queue.empty()
+        file_message = adapter._file_queue.get_nowait()
 
         assert file_message.platform == "telegram"
         assert file_message.room_name == "Test Group"
@@ -105,41 +125,24 @@ class TestTelegramAdapter:
     async def test_on_file_message_queues_photo(self, telegram_config: TelegramConfig) -> None:
         adapter = TelegramAdapter(telegram_config)
 
-        mock_update = MagicMock()
-        mock_message = MagicMock()
-        mock_update.message = mock_message
-
-        mock_message.chat.id = 12345
-        mock_message.chat.title = "Photo Group"
-        mock_message.chat.username = None
-
-        mock_message.from_user.id = 67890
-        mock_message.from_user.full_name = "Jane Doe"
-        mock_message.from_user.username = None
-
-        mock_message.message_id = 200
-        mock_message.date = datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc)
-
-        mock_message.document = None
-        mock_message.video = None
-        mock_message.audio = None
-        mock_message.voice = None
-        mock_message.video_note = None
-
-        # Photos come as a list, largest last
-        mock_photo = MagicMock()
-        mock_photo.file_id = "photo_456"
-        mock_photo.file_size = 54321
-        mock_message.photo = [MagicMock(), mock_photo]
-
-        mock_context = MagicMock()
+        update = FakeUpdate(
+            message=FakeMessage(
+                message_id=200,
+                chat=FakeChat(id=12345, title="Photo Group"),
+                from_user=FakeUser(id=67890, full_name="Jane Doe"),
+                date=datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc),
+                # Photos come as a list, largest last
+                photo=[
+                    FakePhotoSize(file_id="thumb_1", file_size=100),
+                    FakePhotoSize(file_id="photo_456", file_size=54321),
+                ],
+            )
+        )
 
-        await adapter._on_file_message(mock_update, mock_context)
+        await adapter._on_file_message(update, MagicMock())
 
-        file_message = await asyncio.wait_for(
-            adapter._file_queue.get(),
-            timeout=1.0,
-        )
+        assert not adapter._file_queue.empty()
+        file_message = adapter._file_queue.get_nowait()
 
         assert file_message.platform == "telegram"
         assert file_message.filename == "photo_200.jpg"
@@ -149,56 +152,70 @@ class TestTelegramAdapter:
     async def test_on_file_message_ignores_empty_message(self, telegram_config: TelegramConfig) -> None:
         adapter = TelegramAdapter(telegram_config)
 
-        mock_update = MagicMock()
-        mock_update.message = None
-
-        mock_context = MagicMock()
-
-        await adapter._on_file_message(mock_update, mock_context)
+        await adapter._on_file_message(FakeUpdate(message=None), MagicMock())
 
         assert adapter._file_queue.empty()
 
     async def test_on_file_message_private_chat_name(self, telegram_config: TelegramConfig) -> None:
         adapter = TelegramAdapter(telegram_config)
 
-        mock_update = MagicMock()
-        mock_message = MagicMock()
-        mock_update.message = mock_message
+        update = FakeUpdate(
+            message=FakeMessage(
+                message_id=300,
+                # Private chat - no title
+                chat=FakeChat(id=12345, username="private_user"),
+                from_user=FakeUser(id=12345, full_name="Private User", username="private_user"),
+                date=datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc),
+                document=FakeDocument(
+                    file_id="file_789",
+                    file_name="file.txt",
+                    mime_type="text/plain",
+                    file_size=100,
+                ),
+            )
+        )
+
+        await adapter._on_file_message(update, MagicMock())
 
-        # Private chat - no title
-        mock_message.chat.id = 12345
-        mock_message.chat.title = None
-        mock_message.chat.username = "private_user"
+        assert not adapter._file_queue.empty()
+        file_message = adapter._file_queue.get_nowait()
 
-        mock_message.from_user.id = 12345
-        mock_message.from_user.full_name = "Private User"
-        mock_message.from_user.username = "private_user"
+        assert file_message.room_name == "@private_user"
 
-        mock_message.message_id = 300
-        mock_message.date = datetime(2024, 6, 15, 12, 0, 0, tzinfo=timezone.utc)
+    async def test_on_any_message_skips_work_when_debug_disabled(
+        self, telegram_config: TelegramConfig
+    ) -> None:
+        adapter = TelegramAdapter(telegram_config)
 
-        mock_message.document = MagicMock()
-        mock_message.document.file_id = "file_789"
-        mock_message.document.file_name = "file.txt"
-        mock_message.document.mime_type = "text/plain"
-        mock_message.document.file_size = 100
+        # spec_set keeps any access other than .message from silently passing
+        mock_update = MagicMock(spec_set=FakeUpdate)
+        message_property = PropertyMock()
+        type(mock_update).message = message_property
 
-        mock_message.photo = None
-        mock_message.video = None
-        mock_message.audio = None
-        mock_message.voice = None
-        mock_message.video_note = None
+        with patch("src.adapters.telegram.logger") as mock_logger:
+            mock_logger.isEnabledFor.return_value = False
+            await adapter._on_any_message(mock_update, MagicMock())
 
-        mock_context = MagicMock()
+            mock_logger.debug.assert_not_called()
 
-        await adapter._on_file_message(mock_update, mock_context)
+        message_property.assert_not_called()
 
-        file_message = await asyncio.wait_for(
-            adapter._file_queue.get(),
-            timeout=1.0,
-        )
+    async def test_listen_yields_queued_files(self, telegram_config: TelegramConfig) -> None:
+        adapter = TelegramAdapter(telegram_config)
 
-        assert file_message.room_name == "@private_user"
+        file_message = FakeFileMessage(download_url="file_123", filename="test.pdf")
+        await adapter._file_queue.put(file_message)
+
+        listener = adapter.listen()
+        assert await anext(listener) is file_message
+
+        # With nothing queued, listen() waits until cancelled
+        pending = asyncio.create_task(anext(listener))
+        await asyncio.sleep(0)
+        assert not pending.done()
+        pending.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await pending
 
     async def test_download_file(
         self, telegram_config: TelegramConfig, tmp_path: Path
@@ -206,20 +223,65 @@ class TestTelegramAdapter:
         adapter = TelegramAdapter(telegram_config)
         adapter.application = MagicMock()
 
-        mock_tg_file = AsyncMock()
-        adapter.application.bot.get_file = AsyncMock(return_value=mock_tg_file)
+        adapter.application.bot.get_file = AsyncMock(
+            return_value=FakeTelegramFile(
+                file_path="https://api.telegram.org/file/bot123/documents/file_0.pdf"
+            )
+        )
+
+        async def mock_iter_any():
+            yield b"fake pdf data"
+
+        mock_response = MagicMock()
+        mock_response.raise_for_status = MagicMock()
+        mock_response.content.iter_any = mock_iter_any
+
+        mock_get_cm = AsyncMock()
+        mock_get_cm.__aenter__.return_value = mock_response
 
-        mock_file_message = MagicMock()
-        mock_file_message.download_url = "file_123"
-        mock_file_message.filename = "test.pdf"
+        adapter._http = MagicMock()
+        adapter._http.get.return_value = mock_get_cm
+
+        file_message = FakeFileMessage(download_url="file_123", filename="test.pdf")
 
         destination = tmp_path / "test.pdf"
 
-        result = await adapter.download_file(mock_file_message, destination)
+        result = await adapter.download_file(file_message, destination)
 
         assert result == destination
+        assert destination.read_bytes() == b"fake pdf data"
         adapter.application.bot.get_file.assert_called_once_with("file_123")
-        mock_tg_file.download_to_drive.assert_called_once_with(destination)
+        adapter._http.get.assert_called_once_with(
+            "https://api.telegram.org/file/bot123/documents/file_0.pdf"
+        )
+
+    async def test_download_error_does_not_leak_token(
+        self, telegram_config: TelegramConfig, tmp_path: Path
+    ) -> None:
+        token = telegram_config.bot_token
+        file_url = f"https://api.telegram.org/file/bot{token}/documents/file_0.pdf"
+        adapter = TelegramAdapter(telegram_config)
+        adapter.application = MagicMock()
+        adapter.application.bot.get_file = AsyncMock(
+            return_value=FakeTelegramFile(file_path=file_url)
+        )
+
+        mock_response = MagicMock()
+        mock_response.raise_for_status.side_effect = aiohttp.ClientResponseError(
+            MagicMock(real_url=file_url), (), status=404, message="Not Found"
+        )
+        mock_get_cm = AsyncMock()
+        mock_get_cm.__aenter__.return_value = mock_response
+        adapter._http = MagicMock()
+        adapter._http.get.return_value = mock_get_cm
+
+        file_message = FakeFileMessage(download_url="file_123", filename="test.pdf")
+
+        with pytest.raises(RuntimeError) as exc_info:
+            await adapter.download_file(file_message, tmp_path / "test.pdf")
+
+        assert str(exc_info.value) == "Telegram download of file_123 failed: HTTP 404"
+        assert token not in str(exc_info.value)
 
     async def test_download_file_not_connected_raises_error(
         self, telegram_config: TelegramConfig, tmp_path: Path
@@ -227,11 +289,9 @@ class TestTelegramAdapter:
         adapter = TelegramAdapter(telegram_config)
         adapter.application = None
 
-        mock_file_message = MagicMock()
-        mock_file_message.download_url = "file_123"
-        mock_file_message.filename = "test.pdf"
+        file_message = FakeFileMessage(download_url="file_123", filename="test.pdf")
 
         destination = tmp_path / "test.pdf"
 
         with pytest.raises(RuntimeError, match="Not connected"):
-            await adapter.download_file(mock_file_message, destination)
+            await adapter.download_file(file_message, destination)
@@ -1,11 +1,22 @@
+import asyncio
+import logging
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from unittest.mock import MagicMock, patch
+from typing import Any
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
-from webdav3.exceptions import WebDavException
+from webdav3.exceptions import MethodNotSupported, ResponseErrorCode, WebDavException
 
 from src.config import NextcloudConfig
-from src.uploader import DryRunUploader, NextcloudUploader
+from src.uploader import (
+    UPLOAD_CHUNK_SIZE,
+    DryRunUploader,
+    NextcloudAsyncUploader,
+    NextcloudUploader,
+    _get_client,
+)
 
 
 @pytest.fixture
@@ -18,126 +29,473 @@ def nextcloud_config() -> NextcloudConfig:
     )
 
 
+@pytest.fixture(scope="session")
+def sentinel_file(tmp_path_factory: pytest.TempPathFactory) -> Path:
+    # Created once; the uploaders only ever read it
+    path = tmp_path_factory.mktemp("data") / "test.txt"
+    path.write_bytes(b"test content")
+    return path
+
+
+@pytest.fixture(autouse=True)
+def _fresh_clients() -> Iterator[None]:
+    # Clients are cached per account; each test patches in its own
+    _get_client.cache_clear()
+    yield
+    _get_client.cache_clear()
+
+
+@pytest.fixture
+def mock_client_class(monkeypatch: pytest.MonkeyPatch) -> MagicMock:
+    client_class = MagicMock()
+    monkeypatch.setattr("src.uploader.Client", client_class)
+    return client_class
+
+
+@pytest.fixture
+def mock_client(mock_client_class: MagicMock) -> MagicMock:
+    return mock_client_class.return_value
+
+
+class FakeDav:
+    """Stands in for the webdav Client, tracking which collections exist.
+
+    It has no check(), so any PROPFIND (such as Client.upload_to's) fails the test.
+    """
+
+    def __init__(self, exists: Iterable[str] = ()):
+        self.dirs = set(exists)
+        self.mkdirs: list[str] = []
+        self.uploaded: dict[str, bytes] = {}
+        self.uploaded_buffs: dict[str, Any] = {}
+
+    def execute_request(self, action: str, path: str, data: Any = None) -> None:
+        if action == "upload":
+            self.uploaded_buffs[path] = data
+            if isinstance(data, bytes) or hasattr(data, "read"):
+                self.uploaded[path] = data if isinstance(data, bytes) else data.read()
+            return
+        if path in self.dirs:
+            raise MethodNotSupported(name=action, server="nextcloud.example.com")
+        self.mkdirs.append(path)
+        self.dirs.add(path)
+
+
+@pytest.fixture
+def fake_dav(monkeypatch: pytest.MonkeyPatch) -> FakeDav:
+    fake = FakeDav()
+    monkeypatch.setattr("src.uploader.Client", lambda options: fake)
+    return fake
+
+
 class TestNextcloudUploader:
-    def test_init_creates_client(self, nextcloud_config: NextcloudConfig) -> None:
-        with patch("src.uploader.Client") as mock_client_class:
-            uploader = NextcloudUploader(nextcloud_config)
+    def test_init_creates_client(
+        self, nextcloud_config: NextcloudConfig, mock_client_class: MagicMock
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
 
-            mock_client_class.assert_called_once()
-            call_args = mock_client_class.call_args[0][0]
-            assert "testuser" in call_args["webdav_hostname"]
-            assert call_args["webdav_login"] == "testuser"
-            assert call_args["webdav_password"] == "testpass"
+        mock_client_class.assert_called_once()
+        call_args = mock_client_class.call_args[0][0]
+        assert "testuser" in call_args["webdav_hostname"]
+        assert call_args["webdav_login"] == "testuser"
+        assert call_args["webdav_password"] == "testpass"
 
-    def test_full_path(self, nextcloud_config: NextcloudConfig) -> None:
-        with patch("src.uploader.Client"):
-            uploader = NextcloudUploader(nextcloud_config)
+    def test_same_account_shares_client(
+        self, nextcloud_config: NextcloudConfig, mock_client_class: MagicMock
+    ) -> None:
+        first = NextcloudUploader(nextcloud_config)
+        second = NextcloudUploader(nextcloud_config)
+
+        assert first.client is second.client
+        mock_client_class.assert_called_once()
 
-            result = uploader._full_path("matrix/room/file.jpg")
-            assert result == "/TestUploads/matrix/room/file.jpg"
+    def test_full_path(self, nextcloud_config: NextcloudConfig, mock_client: MagicMock) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+
+        result = uploader._full_path("matrix/room/file.jpg")
+        assert result == "/TestUploads/matrix/room/file.jpg"
 
     def test_ensure_directory_creates_missing_dirs(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.ensure_directory("a/b/c")
+
+        assert fake_dav.mkdirs == [
+            "/TestUploads/",
+            "/TestUploads/a/",
+            "/TestUploads/a/b/",
+            "/TestUploads/a/b/c/",
+        ]
+
+    def test_ensure_directory_skips_existing(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav
+    ) -> None:
+        fake_dav.dirs.update({"/TestUploads/", "/TestUploads/existing/"})
+
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.ensure_directory("existing/path")
+        assert fake_dav.mkdirs == ["/TestUploads/existing/path/"]
+
+        uploader.ensure_directory("existing/path")
+        assert len(fake_dav.mkdirs) == 1
+
+    def test_known_dirs_are_bounded(
+        self, nextcloud_config: NextcloudConfig, mock_client: MagicMock
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader._known_dirs.maxsize = 3
+        uploader.ensure_directory("a")
+        uploader.ensure_directory("b")
+        uploader.ensure_directory("c")
+
+        assert len(uploader._known_dirs) == 3
+        assert "/TestUploads/a" not in uploader._known_dirs
+        assert "/TestUploads/c" in uploader._known_dirs
+
+    def test_ensure_directory_raises_on_other_errors(
+        self, nextcloud_config: NextcloudConfig, mock_client: MagicMock
+    ) -> None:
+        mock_client.execute_request.side_effect = ResponseErrorCode(
+            url="/TestUploads/", code=403, message="Forbidden"
+        )
+
+        uploader = NextcloudUploader(nextcloud_config)
+        with pytest.raises(WebDavException):
+            uploader.ensure_directory("a")
+
+    def test_ensure_directory_caches_known_dirs(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.ensure_directory("room/2024-06-15")
+        uploader.ensure_directory("room/2024-06-15")
+        uploader.ensure_directory("room")
+        uploader.ensure_directory("room/2024-06-16")
+
+        assert fake_dav.mkdirs == [
+            "/TestUploads/",
+            "/TestUploads/room/",
+            "/TestUploads/room/2024-06-15/",
+            "/TestUploads/room/2024-06-16/",
+        ]
+
+    def test_upload_file(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav, sentinel_file: Path
+    ) -> None:
+        test_file = sentinel_file
+
+        uploader = NextcloudUploader(nextcloud_config)
+        result = uploader.upload_file(test_file, "matrix/room/test.txt")
+
+        assert result == "/TestUploads/matrix/room/test.txt"
+        assert fake_dav.uploaded == {"/TestUploads/matrix/room/test.txt": b"test content"}
+
+    def test_upload_stream(self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        chunks = iter([b"a", b"b"])
+        result = uploader.upload_stream(chunks, "matrix/room/test.txt")
+
+        assert result == "/TestUploads/matrix/room/test.txt"
+        assert fake_dav.uploaded_buffs == {"/TestUploads/matrix/room/test.txt": chunks}
+
+    def test_upload_stream_with_size_sends_content_length(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.upload_stream(iter([b"ab", b"c"]), "matrix/room/test.txt", size=3)
+
+        buff = fake_dav.uploaded_buffs["/TestUploads/matrix/room/test.txt"]
+        # requests only sends Content-Length for bodies that report a length
+        assert len(buff) == 3
+        assert b"".join(buff) == b"abc"
+
+    @pytest.mark.parametrize("size", [2, 4])
+    def test_upload_stream_rejects_wrong_size(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav, size: int
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.upload_stream(iter([b"ab", b"c"]), "matrix/room/test.txt", size=size)
+
+        buff = fake_dav.uploaded_buffs["/TestUploads/matrix/room/test.txt"]
+        # requests pulls the body lazily; the mismatch aborts it mid-send
+        with pytest.raises(RuntimeError, match="length mismatch"):
+            b"".join(buff)
+
+    def test_concurrent_ensure_directory_creates_each_level_once(
+        self, nextcloud_config: NextcloudConfig, mock_client: MagicMock
+    ) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+
+        with patch.object(uploader, "_make_collection") as mock_make:
+            with ThreadPoolExecutor(max_workers=4) as pool:
+                list(pool.map(uploader.ensure_directory, ["a/b"] * 8))
+
+        assert mock_make.call_count == 3
+
+    def test_upload_bytes(self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav) -> None:
+        uploader = NextcloudUploader(nextcloud_config)
+        result = uploader.upload_bytes(b"data", "signal/room/test.txt")
+
+        assert result == "/TestUploads/signal/room/test.txt"
+        assert fake_dav.uploaded == {"/TestUploads/signal/room/test.txt": b"data"}
+
+    def test_upload_file_creates_parent_directory(
+        self, nextcloud_config: NextcloudConfig, fake_dav: FakeDav, sentinel_file: Path
+    ) -> None:
+        test_file = sentinel_file
+
+        uploader = NextcloudUploader(nextcloud_config)
+        uploader.upload_file(test_file, "new/path/test.txt")
+
+        assert fake_dav.mkdirs[-1] == "/TestUploads/new/path/"
+        assert "/TestUploads/new/path/test.txt" in fake_dav.uploaded
+
+    def test_check_connection_success(
+        self, nextcloud_config: NextcloudConfig, mock_client: MagicMock
+    ) -> None:
+        mock_client.check.return_value = True
+
+        uploader = NextcloudUploader(nextcloud_config)
+        assert uploader.check_connection() is True
+
+    def test_check_connection_failure(
+        self, nextcloud_config: NextcloudConfig, mock_client: MagicMock
+    ) -> None:
+        mock_client.check.side_effect = WebDavException("Connection failed")
+
+        uploader = NextcloudUploader(nextcloud_config)
+        assert uploader.check_connection() is False
+
+
+def _mock_http(status: int = 201) -> MagicMock:
+    mock_response = MagicMock()
+    mock_response.status = status
+    mock_response.raise_for_status = MagicMock()
+
+    mock_cm = AsyncMock()
+    mock_cm.__aenter__.return_value = mock_response
+
+    session = MagicMock()
+    session.closed = False
+    session.request.return_value = mock_cm
+    session.put.return_value = mock_cm
+    session.close = AsyncMock()
+    return session
+
+
+class TestNextcloudAsyncUploader:
+    async def test_session_has_no_overall_timeout(
+        self, nextcloud_config: NextcloudConfig
+    ) -> None:
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        session = uploader._session()
+        try:
+            assert session.timeout.total is None
+            assert session.timeout.sock_read is not None
+            assert session.headers["Authorization"] == "Basic dGVzdHVzZXI6dGVzdHBhc3M="
+            assert session.connector.limit_per_host == 16
+        finally:
+            await uploader.close()
+
+    async def test_ensure_directory_creates_missing_dirs(
         self, nextcloud_config: NextcloudConfig
     ) -> None:
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
 
-            mock_client.check.side_effect = [False, False, True]
+        await uploader.ensure_directory("a/b")
 
-            uploader = NextcloudUploader(nextcloud_config)
-            uploader.ensure_directory("a/b/c")
+        calls = uploader._http.request.call_args_list
+        assert [c.args[0] for c in calls] == ["MKCOL"] * 3
+        assert calls[-1].args[1] == (
+            "https://nextcloud.example.com/remote.php/dav/files/testuser/TestUploads/a/b/"
+        )
 
-            assert mock_client.mkdir.call_count == 2
+        uploader._http.request.reset_mock()
+        await uploader.ensure_directory("a/b")
+        uploader._http.request.assert_not_called()
 
-    def test_ensure_directory_skips_existing(
+    async def test_concurrent_ensure_directory_creates_each_level_once(
         self, nextcloud_config: NextcloudConfig
     ) -> None:
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        created: list[str] = []
 
-            mock_client.check.return_value = True
+        async def make_collection(path: str) -> None:
+            await asyncio.sleep(0.01)
+            created.append(path)
 
-            uploader = NextcloudUploader(nextcloud_config)
-            uploader.ensure_directory("existing/path")
+        with patch.object(uploader, "_make_collection", side_effect=make_collection):
+            await asyncio.gather(*(uploader.ensure_directory("a/b") for _ in range(5)))
 
-            mock_client.mkdir.assert_not_called()
+        assert created == ["/TestUploads", "/TestUploads/a", "/TestUploads/a/b"]
+        assert uploader._dir_locks == {}
 
-    def test_upload_file(
-        self, nextcloud_config: NextcloudConfig, tmp_path: Path
+    async def test_ensure_directory_accepts_existing(
+        self, nextcloud_config: NextcloudConfig
     ) -> None:
-        test_file = tmp_path / "test.txt"
-        test_file.write_text("test content")
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http(status=405)
 
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
-            mock_client.check.return_value = True
+        await uploader.ensure_directory("a")
 
-            uploader = NextcloudUploader(nextcloud_config)
-            result = uploader.upload_file(test_file, "matrix/room/test.txt")
+        uploader._http.request.return_value.__aenter__.return_value.raise_for_status.assert_not_called()
+        assert "/TestUploads/a" in uploader._known_dirs
 
-            assert result == "/TestUploads/matrix/room/test.txt"
-            mock_client.upload_sync.assert_called_once_with(
-                remote_path="/TestUploads/matrix/room/test.txt",
-                local_path=str(test_file),
-            )
+    async def test_upload_file(
+        self, nextcloud_config: NextcloudConfig, sentinel_file: Path
+    ) -> None:
+        test_file = sentinel_file
 
-    def test_upload_file_creates_parent_directory(
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        result = await uploader.upload_file(test_file, "matrix/room/test.txt")
+
+        assert result == "/TestUploads/matrix/room/test.txt"
+        put = uploader._http.put.call_args
+        assert put.args[0].endswith("/TestUploads/matrix/room/test.txt")
+        assert put.kwargs["headers"] == {"Content-Length": "12"}
+
+    async def test_upload_file_streams_in_chunks(
         self, nextcloud_config: NextcloudConfig, tmp_path: Path
     ) -> None:
-        test_file = tmp_path / "test.txt"
-        test_file.write_text("test content")
+        test_file = tmp_path / "big.bin"
+        test_file.write_bytes(b"x" * (2 * UPLOAD_CHUNK_SIZE + 1))
+
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        await uploader.upload_file(test_file, "big.bin")
+
+        body = uploader._http.put.call_args.kwargs["data"]
+        sizes = [len(chunk) async for chunk in body]
+        assert sizes == [UPLOAD_CHUNK_SIZE, UPLOAD_CHUNK_SIZE, 1]
+
+    async def test_upload_bytes(self, nextcloud_config: NextcloudConfig) -> None:
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        result = await uploader.upload_bytes(b"abc", "dir/file.bin")
+
+        assert result == "/TestUploads/dir/file.bin"
+        assert uploader._http.put.call_args.kwargs["data"] == b"abc"
+
+    async def test_upload_stream(self, nextcloud_config: NextcloudConfig) -> None:
+        async def chunks():
+            yield b"abc"
+
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        stream = chunks()
+        result = await uploader.upload_stream(stream, "file.bin")
+
+        assert result == "/TestUploads/file.bin"
+        assert uploader._http.put.call_args.kwargs["data"] is stream
+        assert uploader._http.put.call_args.kwargs["headers"] is None
+
+    async def test_upload_stream_with_size_sends_content_length(
+        self, nextcloud_config: NextcloudConfig
+    ) -> None:
+        async def chunks():
+            yield b"abc"
 
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
-            mock_client.check.side_effect = [False, False, True]
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        await uploader.upload_stream(chunks(), "file.bin", size=3)
 
-            uploader = NextcloudUploader(nextcloud_config)
-            uploader.upload_file(test_file, "new/path/test.txt")
+        put = uploader._http.put.call_args
+        assert put.kwargs["headers"] == {"Content-Length": "3"}
+        assert [chunk async for chunk in put.kwargs["data"]] == [b"abc"]
 
-            assert mock_client.mkdir.call_count >= 1
+    @pytest.mark.parametrize("size", [2, 4])
+    async def test_upload_stream_rejects_wrong_size(
+        self, nextcloud_config: NextcloudConfig, size: int
+    ) -> None:
+        async def chunks():
+            yield b"ab"
+            yield b"c"
+
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http()
+        await uploader.upload_stream(chunks(), "file.bin", size=size)
+
+        body = uploader._http.put.call_args.kwargs["data"]
+        # aiohttp would otherwise truncate the body or leave the server waiting
+        with pytest.raises(RuntimeError, match="length mismatch"):
+            [chunk async for chunk in body]
+
+    async def test_check_connection(self, nextcloud_config: NextcloudConfig) -> None:
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        uploader._http = _mock_http(status=207)
+        assert await uploader.check_connection() is True
 
-    def test_check_connection_success(self, nextcloud_config: NextcloudConfig) -> None:
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
-            mock_client.check.return_value = True
+        uploader._http = _mock_http(status=401)
+        assert await uploader.check_connection() is False
 
-            uploader = NextcloudUploader(nextcloud_config)
-            assert uploader.check_connection() is True
+    async def test_close(self, nextcloud_config: NextcloudConfig) -> None:
+        uploader = NextcloudAsyncUploader(nextcloud_config)
+        session = _mock_http()
+        uploader._http = session
 
-    def test_check_connection_failure(self, nextcloud_config: NextcloudConfig) -> None:
-        with patch("src.uploader.Client") as mock_client_class:
-            mock_client = MagicMock()
-            mock_client_class.return_value = mock_client
-            mock_client.check.side_effect = WebDavException("Connection failed")
+        await uploader.close()
 
-            uploader = NextcloudUploader(nextcloud_config)
-            assert uploader.check_connection() is False
+        session.close.assert_awaited_once()
+        assert uploader._http is None
 
 
 class TestDryRunUploader:
-    def test_upload_file_logs_without_uploading(
-        self, nextcloud_config: NextcloudConfig, tmp_path: Path
+    async def test_upload_file_logs_without_uploading(
+        self, nextcloud_config: NextcloudConfig, sentinel_file: Path
     ) -> None:
-        test_file = tmp_path / "test.txt"
-        test_file.write_text("test content")
+        test_file = sentinel_file
 
         uploader = DryRunUploader(nextcloud_config)
-        result = uploader.upload_file(test_file, "matrix/room/test.txt")
+        result = await uploader.upload_file(test_file, "matrix/room/test.txt")
+
+        assert result == "/TestUploads/matrix/room/test.txt"
+
+    async def test_upload_file_skips_stat_when_info_disabled(
+        self, nextcloud_config: NextcloudConfig, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        caplog.set_level(logging.WARNING, logger="src.uploader")
+        local_path = MagicMock(spec=Path)
+
+        uploader = DryRunUploader(nextcloud_config)
+        result = await uploader.upload_file(local_path, "matrix/room/test.txt")
 
         assert result == "/TestUploads/matrix/room/test.txt"
+        local_path.stat.assert_not_called()
+        local_path.exists.assert_not_called()
+
+    async def test_upload_stream_does_not_consume_chunks(
+        self, nextcloud_config: NextcloudConfig, caplog: pytest.LogCaptureFixture
+    ) -> None:
+        caplog.set_level(logging.INFO, logger="src.uploader")
+        pulled: list[bytes] = []
+
+        async def chunks():
+            pulled.append(b"abc")
+            yield b"abc"
 
-    def test_check_connection_always_returns_true(
+        uploader = DryRunUploader(nextcloud_config)
+        result = await uploader.upload_stream(chunks(), "matrix/room/test.txt", size=3)
+
+        assert result == "/TestUploads/matrix/room/test.txt"
+        assert pulled == []
+        assert "Would upload stream (3 bytes)" in caplog.text
+
+    async def test_check_connection_always_returns_true(
         self, nextcloud_config: NextcloudConfig
     ) -> None:
         uploader = DryRunUploader(nextcloud_config)
-        assert uploader.check_connection() is True
+        assert await uploader.check_connection() is True
+        await uploader.close()
 
     def test_full_path(self, nextcloud_config: NextcloudConfig) -> None:
         uploader = DryRunUploader(nextcloud_config)
         result = uploader._full_path("matrix/room/file.jpg")
         assert result == "/TestUploads/matrix/room/file.jpg"
+
+    def test_full_path_with_root_base_path(self, nextcloud_config: NextcloudConfig) -> None:
+        nextcloud_config.base_path = "/"
+        uploader = DryRunUploader(nextcloud_config)
+        assert uploader._full_path("matrix/file.jpg") == "/matrix/file.jpg"